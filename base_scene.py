@@ -1,5 +1,9 @@
+import pygame as pg
 from defaults import C_BLACK
 from interface import MOUSE_EVENTS
+from profiler import disabled_profiler
+
+HANDLER_CELL_SIZE = 64  # the size of each cell of the mouse handler index
 
 class Scene:
     """Each scene manages the screen, updated and drawn
@@ -12,10 +16,21 @@ class Scene:
         self.actors = []
 
         self.mouse_handlers = []
+        # A coarse index of mouse handlers: cell (x, y) -> handlers overlapping the cell.
+        self.handler_cells = {}
+        self.unindexed_handlers = []  # handlers without a rect receive all events
+        self.engaged_handlers = []  # handlers in a hover or press state
+        self.handler_order = {}  # handler -> the order it was added in
 
         self.flag_new_scene = None
         self.flag_new_scene_args = []
 
+        # For dirty-rect rendering: regions to redraw on the next render.
+        self.redraw_all = True
+        self.dirty_rects = []
+
+        self.profiler = disabled_profiler  # set by the main loop when profiling
+
     def update(self):
         for actor in self.actors:
             actor.update()
@@ -25,11 +40,56 @@ class Scene:
         for actor in self.actors:
             actor.draw(self.screen)
 
+    def render(self):
+        """Dirty-rect drawing: redraws only the regions which changed since
+        the last render (by clipping draw) and returns them, to be pushed
+        with pg.display.update. Returns an empty list if nothing changed.
+        """
+        if self.redraw_all:
+            rects = [self.screen.get_rect()]
+        else:
+            rects = self.dirty_rects
+            for actor in self.actors:
+                rects.extend(actor.dirty_rects())
+
+        self.redraw_all = False
+        self.dirty_rects = []
+        if not rects:
+            return rects
+
+        self.screen.set_clip(rects[0].unionall(rects[1:]))
+        self.draw()
+        self.screen.set_clip(None)
+        return rects
+
+    def invalidate(self, rect=None):
+        """Marks a region (by default, the whole screen) to be redrawn by render."""
+        if rect is None:
+            self.redraw_all = True
+        else:
+            self.dirty_rects.append(pg.Rect(rect))
+
     def handle_events(self, pygame_events):
         for event in pygame_events:
             if event.type in MOUSE_EVENTS:
-                for button in self.mouse_handlers:
+                # Only handlers under the pointer, or leaving their hover or
+                # press state, are passed the event: others would ignore it.
+                targets = self.handlers_at(event.pos)
+                for button in targets:
                     button.mouse_event(event)
+                self.engaged_handlers = [button for button in targets if button.engaged()]
+
+    def handlers_at(self, position):
+        """The handlers to pass a mouse event at position, in the order they were added."""
+        cell = (position[0] // HANDLER_CELL_SIZE, position[1] // HANDLER_CELL_SIZE)
+        targets = set(self.handler_cells.get(cell, ()))
+        targets.update(self.engaged_handlers)
+        targets.update(self.unindexed_handlers)
+        return sorted(targets, key=self.handler_order.get)
+
+    def profile(self, phase):
+        """Times a phase of work inside the scene, i.e. `with self.profile("name"):`."""
+        return self.profiler.phase(phase)
 
     def change_scene(self, new_scene, *args, **kwargs):
         self.flag_new_scene = new_scene
@@ -38,9 +98,23 @@ class Scene:
 
     # Utility functions
     def add_mouse_handler(self, interactable):
+        """Registers an actor for drawing, updates and mouse events. Mouse
+        handlers need a mouse_event and an engaged method; a handler with a
+        rect only receives events over its rect (or while engaged)."""
+        self.handler_order[interactable] = len(self.mouse_handlers)
         self.mouse_handlers.append(interactable)
         self.actors.append(interactable)
 
+        rect = getattr(interactable, "rect", None)
+        if rect is None:
+            self.unindexed_handlers.append(interactable)
+            return
+        for cell_x in range(rect.left // HANDLER_CELL_SIZE,
+                            (rect.right - 1) // HANDLER_CELL_SIZE + 1):
+            for cell_y in range(rect.top // HANDLER_CELL_SIZE,
+                                (rect.bottom - 1) // HANDLER_CELL_SIZE + 1):
+                self.handler_cells.setdefault((cell_x, cell_y), []).append(interactable)
+
     def display_width(self) -> int:
         return self.screen.get_size()[0]
 
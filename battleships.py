@@ -1,4 +1,5 @@
-from random import randint, choice
+from random import randrange
+from functools import lru_cache
 import base64
 
 class Ship:
@@ -19,6 +20,8 @@ class Ship:
                 yield self.origin_col, self.origin_row + i
 
     def destroyed(self, revealed) -> bool:
+        if isinstance(revealed, BOARD_CLASSES):
+            return revealed.destroyed(self)
         return all(revealed[row][col] for col, row in self.tile_indexes())
 
 def default_ships():
@@ -30,51 +33,378 @@ def default_ships():
         Ship(0, 4, 5, True, "Aircraft Carrier")
     ]
 
+def fleet(copies):
+    """Several copies of the default ships, for large boards."""
+    return [Ship(0, 0, ship.size, True, f"{ship.name} {copy + 1}")
+            for copy in range(copies) for ship in default_ships()]
+
 
 Valid, OutOfBounds, Overlap, OverlapAdjacent = range(4)
 
+class LayoutError(ValueError):
+    """No valid layout exists for the ships on this board."""
+
 def generate_blank_grid(default_value, width=10, height=10):
     return [[default_value for _tile in range(width)] for _row in range(height)]
 
+class PlacementIndex:
+    """Every in-bounds (col, row, horizontal) placement of a 1 x size ship
+    on a width x height board, with the tiles each one covers (as (col, row)
+    tuples and as a BitBoard mask) and which placements cover each tile.
+    Use placement_index() rather than constructing one: indexes are memoized.
+    """
+    def __init__(self, width, height, size):
+        self.width = width
+        self.height = height
+        self.size = size
+
+        self.placements = []  # (col, row, horizontal) of each placement
+        self.tiles = []  # the (col, row) tiles covered by each placement
+        self.masks = []
+        self.lookup = {}  # (col, row, horizontal) -> placement number
+        self.covering = [[] for _tile in range(width * height)]  # tile -> placements
+
+        for row in range(height):
+            for col in range(width):
+                for horizontal in True, False:
+                    if (col + size > width) if horizontal else (row + size > height):
+                        continue  # out of bounds
+                    ship = Ship(col, row, size, horizontal)
+                    number = len(self.placements)
+
+                    self.placements.append((col, row, horizontal))
+                    self.tiles.append(tuple(ship.tile_indexes()))
+                    self.masks.append(sum(1 << (tile_row * width + tile_col)
+                                          for tile_col, tile_row in ship.tile_indexes()))
+                    self.lookup[col, row, horizontal] = number
+                    for tile_col, tile_row in ship.tile_indexes():
+                        self.covering[tile_row * width + tile_col].append(number)
+
+    def find(self, ship):
+        """The placement number of the ship's position, or None if out of bounds."""
+        return self.lookup.get((ship.origin_col, ship.origin_row, ship.horizontal))
+
+    def placements_covering(self, col: int, row: int):
+        return self.covering[row * self.width + col]
+
+@lru_cache(maxsize=32)
+def placement_index(width, height, size) -> PlacementIndex:
+    return PlacementIndex(width, height, size)
+
+class BitBoard:
+    """A board stored as integer bitmasks, in place of the nested-list
+    arrangement and revealed grids. Tile (col, row) is bit row*width + col.
+    One mask holds occupied tiles, one revealed tiles and one each ship's
+    tiles, so hit, sunk and overlap tests are single integer operations.
+    """
+    def __init__(self, width=10, height=10):
+        self.width = width
+        self.height = height
+        self.full = (1 << width * height) - 1  # every tile on the board
+
+        self.occupied = 0
+        self.revealed = 0
+        self.ship_masks = {}  # ship -> mask of the tiles it covers
+        self.tile_ships = {}  # bit index -> ship covering that tile
+
+    @classmethod
+    def from_ships(cls, ships, width=10, height=10):
+        board = cls(width, height)
+        for ship in ships:
+            board.place_ship(ship)
+        return board
+
+    def bit(self, col: int, row: int) -> int:
+        return 1 << (row * self.width + col)
+
+    def ship_mask(self, ship):
+        """The mask of the tiles this ship covers, or None if out of bounds."""
+        index = placement_index(self.width, self.height, ship.size)
+        number = index.find(ship)
+        return None if number is None else index.masks[number]
+
+    def check_ship_position(self, ship) -> int:
+        mask = self.ship_mask(ship)
+        if mask is None:
+            return OutOfBounds
+        elif mask & self.occupied:
+            return Overlap
+        return Valid
+
+    def place_ship(self, ship):
+        index = placement_index(self.width, self.height, ship.size)
+        number = index.find(ship)
+        self.ship_masks[ship] = index.masks[number]
+        self.occupied |= index.masks[number]
+        for col, row in index.tiles[number]:
+            self.tile_ships[row * self.width + col] = ship
+
+    def remove_ship(self, ship):
+        self.occupied &= ~self.ship_masks.pop(ship)
+        for col, row in ship.tile_indexes():
+            del self.tile_ships[row * self.width + col]
+
+    def ship_at(self, col: int, row: int):
+        return self.tile_ships.get(row * self.width + col)
+
+    def is_revealed(self, col: int, row: int) -> bool:
+        return bool(self.revealed >> (row * self.width + col) & 1)
+
+    def reveal(self, col: int, row: int):
+        """Reveals the tile, returning the ship hit (None for a miss)."""
+        self.revealed |= self.bit(col, row)
+        return self.ship_at(col, row)
+
+    def destroyed(self, ship) -> bool:
+        return not self.ship_masks[ship] & ~self.revealed
+
+    def all_destroyed(self) -> bool:
+        return not self.occupied & ~self.revealed
+
+    def all_revealed(self) -> bool:
+        return self.revealed == self.full
+
+    def misses(self) -> int:
+        """The mask of revealed tiles that do not hide a ship."""
+        return self.revealed & ~self.occupied
+
+    def revealed_tiles(self):
+        """Generator that yields the coordinates of all revealed tiles."""
+        mask = self.revealed
+        while mask:
+            lowest = mask & -mask
+            index = lowest.bit_length() - 1
+            yield index % self.width, index // self.width
+            mask ^= lowest
+
+class SparseBoard:
+    """A board for very large grids, with the same methods as BitBoard but
+    stored sparsely: a dict of occupied tiles and a set of revealed tiles,
+    so memory grows with the ships and shots rather than the board area.
+    Each ship's hits are counted as they are revealed, so sunk and
+    all-sunk tests don't look at the ship's tiles.
+    """
+    def __init__(self, width=100, height=100):
+        self.width = width
+        self.height = height
+
+        self.tile_ships = {}  # (col, row) -> ship covering that tile
+        self.revealed = set()  # (col, row) of revealed tiles
+        self.ship_hits = {}  # ship -> number of its tiles revealed
+        self.ships_afloat = 0
+
+    @classmethod
+    def from_ships(cls, ships, width=100, height=100):
+        board = cls(width, height)
+        for ship in ships:
+            board.place_ship(ship)
+        return board
+
+    def in_bounds(self, ship) -> bool:
+        if ship.origin_col < 0 or ship.origin_row < 0:
+            return False
+        if ship.horizontal:
+            return ship.origin_col + ship.size <= self.width and ship.origin_row < self.height
+        return ship.origin_row + ship.size <= self.height and ship.origin_col < self.width
+
+    def check_ship_position(self, ship) -> int:
+        if not self.in_bounds(ship):
+            return OutOfBounds
+        elif any(tile in self.tile_ships for tile in ship.tile_indexes()):
+            return Overlap
+        return Valid
+
+    def place_ship(self, ship):
+        hits = 0
+        for tile in ship.tile_indexes():
+            self.tile_ships[tile] = ship
+            hits += tile in self.revealed
+        self.ship_hits[ship] = hits
+        self.ships_afloat += hits < ship.size
+
+    def remove_ship(self, ship):
+        self.ships_afloat -= self.ship_hits.pop(ship) < ship.size
+        for tile in ship.tile_indexes():
+            del self.tile_ships[tile]
+
+    def ship_at(self, col: int, row: int):
+        return self.tile_ships.get((col, row))
+
+    def is_revealed(self, col: int, row: int) -> bool:
+        return (col, row) in self.revealed
+
+    def reveal(self, col: int, row: int):
+        """Reveals the tile, returning the ship hit (None for a miss)."""
+        ship = self.tile_ships.get((col, row))
+        if (col, row) not in self.revealed:
+            self.revealed.add((col, row))
+            if ship is not None:
+                self.ship_hits[ship] += 1
+                self.ships_afloat -= self.ship_hits[ship] == ship.size
+        return ship
+
+    def destroyed(self, ship) -> bool:
+        return self.ship_hits[ship] == ship.size
+
+    def all_destroyed(self) -> bool:
+        return not self.ships_afloat
+
+    def all_revealed(self) -> bool:
+        return len(self.revealed) == self.width * self.height
+
+    def misses(self):
+        """The set of revealed tiles that do not hide a ship."""
+        return {tile for tile in self.revealed if tile not in self.tile_ships}
+
+    def revealed_tiles(self):
+        """Generator that yields the coordinates of all revealed tiles."""
+        yield from self.revealed
+
+BOARD_CLASSES = (BitBoard, SparseBoard)
+
 def check_ship_position(ship, arrangement, width=10, height=10) -> int:
     """Returns an integer 0 <= x <= 2, where 0 -> valid ship position.
     1 -> out of bounds, 2 -> overlapping ship.
+    The arrangement may be a nested-list grid, a BitBoard or a SparseBoard.
     """
-    for col, row in ship.tile_indexes():
-        # If tile is out of bounds or occupied, the ship is invalid.
-        if col < 0 or col >= width or row < 0 or row >= height:
-            return OutOfBounds
-        elif arrangement[row][col] is not None:
+    if isinstance(arrangement, BOARD_CLASSES):
+        return arrangement.check_ship_position(ship)
+
+    index = placement_index(width, height, ship.size)
+    number = index.find(ship)
+    if number is None:
+        return OutOfBounds
+
+    for col, row in index.tiles[number]:
+        # If any tile is occupied, the ship is invalid.
+        if arrangement[row][col] is not None:
             return Overlap
     return Valid
 
 def remove_ship(ship, ships, arrangement):
-    for col, row in ship.tile_indexes():
-        arrangement[row][col] = None  # remove reference to deleted or moved ship
+    if isinstance(arrangement, BOARD_CLASSES):
+        arrangement.remove_ship(ship)
+    else:
+        for col, row in ship.tile_indexes():
+            arrangement[row][col] = None  # remove reference to deleted or moved ship
     ships.remove(ship)
 
 def place_ship(ship, ships, arrangement):
-    for col, row in ship.tile_indexes():
-        arrangement[row][col] = ship  # update references to point to the new ship
+    if isinstance(arrangement, BOARD_CLASSES):
+        arrangement.place_ship(ship)
+    else:
+        for col, row in ship.tile_indexes():
+            arrangement[row][col] = ship  # update references to point to the new ship
     ships.append(ship)
 
-def generate_computer_layout(ships, arrangement, stock_ships, width=10, height=10):
-    """Randomly generates a valid layout and stores it in ships."""
-    assert width > 5 and height > 5  # minimum board size to fit all ships
+def sample_placements(sizes, occupied=0, width=10, height=10, node_limit=10000):
+    """Randomly chooses a (col, row, horizontal) placement for each ship
+    size in turn, drawn uniformly from the placements still legal. If a
+    ship cannot be placed, earlier choices are revisited (backtracking);
+    raises LayoutError if the ships cannot fit around the occupied mask,
+    or if no layout is found after trying node_limit partial layouts.
+    """
+    indexes = [placement_index(width, height, size) for size in sizes]
+    chosen = []
+    failed = set()  # (ship number, occupied) states known to have no layout
+    # The tiles the ships from number i onwards need, for pruning by area.
+    needed = [sum(sizes[i:]) for i in range(len(sizes) + 1)]
+    area = width * height
+    nodes = 0
+
+    def place(i, occupied):
+        nonlocal nodes
+        if i == len(indexes):
+            return True
+        if (i, occupied) in failed or needed[i] > area - bin(occupied).count("1"):
+            return False
+        nodes += 1
+        if nodes > node_limit:
+            raise LayoutError(f"no layout of ships of sizes {list(sizes)} found on a "
+                              f"{width} x {height} board after {node_limit} tries")
+
+        index = indexes[i]
+        legal = [number for number, mask in enumerate(index.masks) if not mask & occupied]
+        while legal:
+            # Draw without replacement: swap the chosen placement to the end.
+            pick = randrange(len(legal))
+            legal[pick], legal[-1] = legal[-1], legal[pick]
+            number = legal.pop()
+
+            chosen.append(index.placements[number])
+            if place(i + 1, occupied | index.masks[number]):
+                return True
+            chosen.pop()
+
+        failed.add((i, occupied))
+        return False
 
-    for ship in stock_ships:
-        # Loop until valid: with default ships, there will always be a valid position.
-        placed = False
-        while not placed:
-            ship.origin_col = randint(0, width)
-            ship.origin_row = randint(0, height)
-            ship.horizontal = choice((False, True))
+    if not place(0, occupied):
+        raise LayoutError(f"{len(sizes)} ships of sizes {list(sizes)} cannot fit "
+                          f"on a {width} x {height} board")
+    return chosen
 
-            if check_ship_position(ship, arrangement, width, height) == Valid:
-                placed = True
+def sample_sparse_placements(sizes, board, attempts=1000):
+    """Randomly chooses a (col, row, horizontal) placement for each ship
+    size on a SparseBoard by rejection sampling: random positions are tried
+    until one fits, so the cost depends on how crowded the board is rather
+    than its area. Raises LayoutError if a ship fails to fit `attempts` times.
+    """
+    taken = set(board.tile_ships)
+    chosen = []
+    for size in sizes:
+        for _attempt in range(attempts):
+            horizontal = randrange(2) == 0
+            col = randrange(board.width - size + 1 if horizontal else board.width)
+            row = randrange(board.height if horizontal else board.height - size + 1)
+            tiles = list(Ship(col, row, size, horizontal).tile_indexes())
+            if not any(tile in taken for tile in tiles):
+                taken.update(tiles)
+                chosen.append((col, row, horizontal))
+                break
+        else:
+            raise LayoutError(f"failed to fit a ship of size {size} on a {board.width} x "
+                              f"{board.height} board after {attempts} attempts")
+    return chosen
+
+def generate_computer_layout(ships, arrangement, stock_ships, width=10, height=10):
+    """Randomly generates a valid layout and stores it in ships.
+    Raises LayoutError if the stock ships cannot all be placed.
+    """
+    if isinstance(arrangement, SparseBoard):
+        placements = sample_sparse_placements([ship.size for ship in stock_ships], arrangement)
+        for ship, (col, row, horizontal) in zip(stock_ships, placements):
+            ship.origin_col, ship.origin_row, ship.horizontal = col, row, horizontal
+            place_ship(ship, ships, arrangement)
+        return
+
+    if isinstance(arrangement, BitBoard):
+        occupied = arrangement.occupied
+    else:
+        occupied = sum(1 << (row * width + col) for row, tiles in enumerate(arrangement)
+                       for col, tile in enumerate(tiles) if tile is not None)
 
+    placements = sample_placements([ship.size for ship in stock_ships], occupied,
+                                   width, height)
+    for ship, (col, row, horizontal) in zip(stock_ships, placements):
+        ship.origin_col, ship.origin_row, ship.horizontal = col, row, horizontal
         place_ship(ship, ships, arrangement)
 
+def generate_layouts(stock_ships, width=10, height=10, count=None):
+    """Generator of random layouts (lists of new ships, named and sized
+    like stock_ships); runs forever if count is None. Raises LayoutError
+    straight away if no valid layout exists.
+    """
+    sizes = [ship.size for ship in stock_ships]
+    names = [ship.name for ship in stock_ships]
+    generated = 0
+
+    while count is None or generated < count:
+        placements = sample_placements(sizes, 0, width, height)
+        yield [Ship(col, row, size, horizontal, name) for (col, row, horizontal), size, name
+               in zip(placements, sizes, names)]
+        generated += 1
+
 def adjacent_tiles(col: int, row: int, width=10, height=10):
     for offset in ((0, -1), (1, 0), (0, 1), (-1, 0)):
         nearby_col = col + offset[0]
@@ -103,6 +433,8 @@ def decode_layout(encoded: bytes):
 
 
 if __name__ == "__main__":
+    from time import perf_counter
+
     # `Test: check_ship_position(ship, arrangement)`
     test_arrangement = generate_blank_grid(None, width=10, height=10)
 
@@ -117,3 +449,73 @@ if __name__ == "__main__":
                                               width=10, height=10)
     assert Overlap == check_ship_position(Ship(3, 0, 2, True), test_arrangement)
     print("Test passed: check_ship_position()")
+
+    # `Test: BitBoard`
+    test_board = BitBoard.from_ships([test_ship], width=10, height=10)
+
+    assert Valid == check_ship_position(Ship(0, 0, 4, True), test_board)
+    assert OutOfBounds == check_ship_position(Ship(0, -1, 2, False), test_board)
+    assert OutOfBounds == check_ship_position(Ship(9, 0, 2, True), test_board)
+    assert OutOfBounds == check_ship_position(Ship(3, 0, 20, False), test_board)
+    assert Overlap == check_ship_position(Ship(3, 0, 2, True), test_board)
+    assert Overlap == check_ship_position(Ship(5, 0, 3, False), test_board)
+
+    assert test_board.reveal(0, 0) is None and test_board.misses() == 1
+    assert test_board.reveal(4, 0) is test_ship and not test_ship.destroyed(test_board)
+    assert test_board.reveal(5, 0) is test_ship and test_ship.destroyed(test_board)
+    assert test_board.all_destroyed()
+    assert sorted(test_board.revealed_tiles()) == [(0, 0), (4, 0), (5, 0)]
+    print("Test passed: BitBoard")
+
+    # `Test: generate_computer_layout(ships, arrangement, stock_ships)`
+    for test_layout in generate_layouts(default_ships(), width=6, height=6, count=200):
+        test_board = BitBoard(width=6, height=6)
+        for test_ship in test_layout:
+            assert Valid == check_ship_position(test_ship, test_board)
+            test_board.place_ship(test_ship)
+
+    try:
+        generate_computer_layout([], BitBoard(3, 3), default_ships(), width=3, height=3)
+    except LayoutError:
+        pass
+    else:
+        raise AssertionError("expected LayoutError: 5 ships cannot fit on 3 x 3")
+
+    try:
+        sample_placements([3, 3, 3, 2], width=3, height=3)
+    except LayoutError:
+        pass
+    else:
+        raise AssertionError("expected LayoutError: 3, 3, 3, 2 cannot fit on 3 x 3")
+
+    # Infeasible fleets fail fast: by area, or (for 6 x 6 less two opposite
+    # corners, which fits 17 ships of size 2 by area but not by colouring)
+    # by the limit on backtracking.
+    for test_sizes, test_occupied, test_size in (([2] * 13, 0, 5), ([2] * 19, 0, 6),
+                                                 ([2] * 17, 1 | 1 << 35, 6)):
+        test_start = perf_counter()
+        try:
+            sample_placements(test_sizes, test_occupied, test_size, test_size)
+        except LayoutError:
+            pass
+        else:
+            raise AssertionError(f"expected LayoutError: {test_sizes} on {test_size} x {test_size}")
+        assert perf_counter() - test_start < 2, "an infeasible fleet took too long to fail"
+    print("Test passed: generate_computer_layout()")
+
+    # `Test: SparseBoard`
+    test_board = SparseBoard(width=1000, height=1000)
+    test_ships = []
+    generate_computer_layout(test_ships, test_board, fleet(100))
+    assert len(test_ships) == 500 and not test_board.all_destroyed()
+    assert len(test_board.tile_ships) == sum(ship.size for ship in test_ships)
+    for test_ship in test_ships:
+        assert Overlap == check_ship_position(test_ship, test_board)
+
+    test_ship = test_ships[0]
+    for test_col, test_row in test_ship.tile_indexes():
+        assert test_board.reveal(test_col, test_row) is test_ship
+    assert test_ship.destroyed(test_board) and test_board.ships_afloat == 499
+    assert OutOfBounds == check_ship_position(Ship(999, 0, 2, True), test_board)
+    assert OutOfBounds == check_ship_position(Ship(0, 999, 2, False), test_board)
+    print("Test passed: SparseBoard")
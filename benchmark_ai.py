@@ -0,0 +1,118 @@
+"""Strength and speed benchmarks for the computer players: each player fires
+at the same seeded layouts until every ship is sunk, on several board sizes,
+and the distributions of shots taken and time per move are reported.
+
+    python benchmark_ai.py --players computer_player:OpportunityPlayer \
+        computer_player:VectorOpportunityPlayer --sizes 10x10 16x16 --games 500
+
+Any class taking (ships, arrangement, revealed, width, height) with a
+play_move() method can be benchmarked by its module:Class path.
+"""
+from functools import partial
+from importlib import import_module
+from multiprocessing import Pool
+from random import seed as seed_random
+from statistics import mean, quantiles
+from time import perf_counter
+import json
+
+from battleships import default_ships, generate_computer_layout, BitBoard
+from defaults import board_width, board_height
+
+def load_player(path):
+    """The player class named by a "module:Class" path."""
+    module_name, _, class_name = path.partition(":")
+    if not class_name:
+        raise ValueError(f"expected module:Class, not {path!r}")
+    return getattr(import_module(module_name), class_name)
+
+def parse_size(size):
+    """'16x12' -> (16, 12)"""
+    width, _, height = size.lower().partition("x")
+    return int(width), int(height or width)
+
+def solo_game(game_seed, player_path, width=board_width, height=board_height):
+    """One player fires at a seeded layout until it is sunk. Returns the
+    (shots taken, or None if the player gave up, [seconds per move])."""
+    seed_random(game_seed)
+    ships = []
+    board = BitBoard(width, height)
+    generate_computer_layout(ships, board, default_ships(), width, height)
+    seed_random(game_seed)  # the player's choices don't depend on the layout sampler
+
+    player = load_player(player_path)(ships, board, board, width, height)
+    move_times = []
+    try:
+        while not board.all_destroyed():
+            start = perf_counter()
+            col, row = player.play_move()
+            move_times.append(perf_counter() - start)
+
+            if col is None or row is None or board.is_revealed(col, row):
+                return None, move_times  # gave up, or fired at a revealed tile
+            board.reveal(col, row)
+    finally:
+        if hasattr(player, "close"):
+            player.close()
+    return len(move_times), move_times
+
+def distribution(values):
+    """Summary statistics of a list of numbers."""
+    if not values:
+        return {}
+    ordered = sorted(values)
+    points = quantiles(ordered, n=100, method="inclusive") if len(ordered) > 1 \
+        else [ordered[0]] * 99
+    return {"mean": mean(ordered), "min": ordered[0], "p50": points[49],
+            "p95": points[94], "p99": points[98], "max": ordered[-1]}
+
+def benchmark(player_path, width, height, seeds, processes=None, chunksize=16):
+    """Plays every seed with the player, over a process pool."""
+    play = partial(solo_game, player_path=player_path, width=width, height=height)
+    if processes == 1:
+        games = [play(game_seed) for game_seed in seeds]
+    else:
+        with Pool(processes) as pool:
+            games = pool.map(play, seeds, chunksize)
+
+    shots = [shots for shots, _times in games if shots is not None]
+    move_ms = [time * 1000 for _shots, times in games for time in times]
+    return {"player": player_path, "width": width, "height": height,
+            "games": len(games), "gave_up": len(games) - len(shots),
+            "shots": distribution(shots), "move_ms": distribution(move_ms)}
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark computer players.")
+    parser.add_argument("--players", nargs="+", default=["computer_player:OpportunityPlayer"],
+                        metavar="MODULE:CLASS")
+    parser.add_argument("--sizes", nargs="+", default=[f"{board_width}x{board_height}", "16x16"],
+                        metavar="WIDTHxHEIGHT")
+    parser.add_argument("--games", type=int, default=200)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    args = parser.parse_args()
+
+    for path in args.players:
+        load_player(path)  # fail early on a mistyped path
+
+    game_seeds = range(args.first_seed, args.first_seed + args.games)
+    results = []
+    for size in args.sizes:
+        width, height = parse_size(size)
+        for path in args.players:
+            result = benchmark(path, width, height, game_seeds, args.processes)
+            results.append(result)
+            shots, move_ms = result["shots"], result["move_ms"]
+            print(f"{path} on {width}x{height}: shots mean {shots.get('mean', 0):.2f} "
+                  f"p50 {shots.get('p50', 0):.0f} p95 {shots.get('p95', 0):.0f} "
+                  f"max {shots.get('max', 0)}; move p50 {move_ms.get('p50', 0):.3f}ms "
+                  f"p99 {move_ms.get('p99', 0):.3f}ms max {move_ms.get('max', 0):.3f}ms"
+                  + (f"; gave up {result['gave_up']}" if result["gave_up"] else ""))
+
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
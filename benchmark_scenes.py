@@ -0,0 +1,208 @@
+"""Headless rendering benchmarks: runs each scene with SDL's dummy video and
+audio drivers, feeding it scripted mouse and keyboard events, and records
+the time taken by update and draw on every frame.
+
+    python benchmark_scenes.py --output baseline.json
+    python benchmark_scenes.py --compare baseline.json
+    python benchmark_scenes.py --check-rendering
+"""
+import os
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import argparse
+import json
+import random
+import sys
+
+import pygame as pg
+
+from battleships import default_ships, generate_blank_grid, generate_computer_layout
+from defaults import display_width, display_height, dirty_rect_rendering
+from profiler import FrameProfiler
+
+# Regions that are safe to click in each kind of scene (x, y, width, height):
+# clicking anywhere else could leave the scene or wait for console input.
+SETUP_CLICKS = ((0, 0, 88, display_height), (130, 50, 316, 316))
+GAME_CLICKS = ((30, 50, 316, 316), (375, 370, 120, 28))
+
+def create_scene(name, screen, clock):
+    import scenes
+
+    if name == "choose_mode":
+        return scenes.ChooseMode(screen, clock)
+    elif name == "large_board":
+        return scenes.LargeBoard(screen, clock)
+
+    kind, mode_name = name.split("_", 1)
+    mode = {"single": scenes.ModeSingle, "computer": scenes.ModeComputer,
+            "two_player": scenes.ModeTwoPlayer}[mode_name]
+    if kind == "setup":
+        return scenes.Setup(screen, clock, mode)
+
+    player_ships = ([], [])
+    player_arrangement = (generate_blank_grid(None), generate_blank_grid(None))
+    for player in 0, 1:
+        generate_computer_layout(player_ships[player], player_arrangement[player],
+                                 default_ships())
+    return scenes.Game(screen, clock, mode, player_ships, player_arrangement)
+
+def scripted_events(name, rng):
+    """One frame's events: the mouse wanders, with occasional clicks (only in
+    safe regions) and, in the designer, occasional presses of R (or arrow
+    keys to scroll the large board)."""
+    x, y = rng.randrange(display_width), rng.randrange(display_height)
+    events = [pg.event.Event(pg.MOUSEMOTION, pos=(x, y), rel=(0, 0), buttons=(0, 0, 0))]
+
+    regions = SETUP_CLICKS if name.startswith("setup") else \
+        GAME_CLICKS if name.startswith("game") else ()
+    if regions and rng.random() < 0.1:
+        left, top, width, height = rng.choice(regions)
+        pos = (left + rng.randrange(width), top + rng.randrange(height))
+        events += [pg.event.Event(pg.MOUSEMOTION, pos=pos, rel=(0, 0), buttons=(0, 0, 0)),
+                   pg.event.Event(pg.MOUSEBUTTONDOWN, pos=pos, button=1),
+                   pg.event.Event(pg.MOUSEBUTTONUP, pos=pos, button=1)]
+    if name.startswith("setup") and rng.random() < 0.02:
+        events.append(pg.event.Event(pg.KEYDOWN, key=pg.K_r, mod=0, unicode="r"))
+    elif name == "large_board" and rng.random() < 0.05:
+        key = rng.choice((pg.K_LEFT, pg.K_RIGHT, pg.K_UP, pg.K_DOWN))
+        events.append(pg.event.Event(pg.KEYDOWN, key=key, mod=pg.KMOD_SHIFT, unicode=""))
+    return events
+
+def run_scenario(name, frames, screen, seed=0, dirty_rects=dirty_rect_rendering):
+    """Runs a scene for a number of frames, returning the timing summary.
+    The scene is recreated whenever a game is won or the scene ends."""
+    rng = random.Random(seed)
+    random.seed(seed)  # layouts and computer moves
+    clock = pg.time.Clock()
+    profiler = FrameProfiler(window=frames)
+    scene = create_scene(name, screen, clock)
+    restarts = 0
+
+    for _frame in range(frames):
+        profiler.start_frame()
+        with profiler.phase("events"):
+            scene.handle_events(scripted_events(name, rng))
+        with profiler.phase("update"):
+            scene.update()
+        with profiler.phase("draw"):
+            if dirty_rects:
+                scene.render()
+            else:
+                scene.draw()
+        profiler.end_frame()
+        clock.tick()
+
+        if scene_finished(name, scene):
+            scene = create_scene(name, screen, clock)
+            restarts += 1
+
+    summary = profiler.summary()
+    summary["restarts"] = restarts
+    return summary
+
+def scene_finished(name, scene):
+    """Whether a game is won or the scene ends, so it should be recreated."""
+    return scene.flag_new_scene is not None or getattr(scene, "winner", None) is not None \
+        or name == "large_board" and scene.board.all_destroyed()
+
+def check_rendering(name, frames, screen, seed=0):
+    """Runs a scene with dirty-rect rendering, and after every frame also
+    draws it in full to a second surface. Returns the numbers of the frames
+    on which the two differ."""
+    rng = random.Random(seed)
+    random.seed(seed)
+    clock = pg.time.Clock()
+    full = pg.Surface(screen.get_size())
+    scene = create_scene(name, screen, clock)
+    mismatches = []
+
+    for frame in range(frames):
+        scene.handle_events(scripted_events(name, rng))
+        scene.update()
+        scene.render()
+        scene.screen = full
+        scene.draw()
+        scene.screen = screen
+        if pg.image.tostring(screen, "RGB") != pg.image.tostring(full, "RGB"):
+            mismatches.append(frame)
+
+        if scene_finished(name, scene):
+            scene = create_scene(name, screen, clock)
+    return mismatches
+
+SCENARIOS = ("choose_mode", "setup_single", "setup_computer", "setup_two_player",
+             "game_single", "game_computer", "game_two_player", "large_board")
+
+def compare(results, baseline, tolerance, noise_ms=0.1):
+    """Lists the (scenario, phase, percentile) timings which are more than
+    tolerance (a fraction) slower than the baseline, ignoring tiny changes."""
+    regressions = []
+    for scenario, phases in results["scenarios"].items():
+        for phase in ("update", "draw"):
+            for point in ("p50", "p95"):
+                try:
+                    before = baseline["scenarios"][scenario][phase][point]
+                except KeyError:
+                    continue
+                after = phases[phase][point]
+                if after > before * (1 + tolerance) and after - before > noise_ms:
+                    regressions.append((scenario, phase, point, before, after))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless rendering benchmarks.")
+    parser.add_argument("--frames", type=int, default=3000)
+    parser.add_argument("--scenarios", nargs="+", default=SCENARIOS, choices=SCENARIOS)
+    parser.add_argument("--full-redraw", action="store_true",
+                        help="draw every frame in full, instead of dirty-rect rendering")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE",
+                        help="flag regressions against a previous --output file")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown against the baseline (0.2 = 20%%)")
+    parser.add_argument("--check-rendering", action="store_true",
+                        help="check that dirty-rect rendering matches a full redraw "
+                             "on every frame, instead of timing")
+    arguments = parser.parse_args()
+
+    pg.init()
+    screen = pg.display.set_mode((display_width, display_height))
+    if arguments.check_rendering:
+        failed = False
+        for name in arguments.scenarios:
+            mismatches = check_rendering(name, arguments.frames, screen)
+            failed = failed or bool(mismatches)
+            print(f"{name:>17}: " + (f"{len(mismatches)} frames differ from a full redraw, "
+                                     f"first {mismatches[0]}" if mismatches
+                                     else "matches a full redraw"))
+        sys.exit(1 if failed else 0)
+
+    results = {"frames": arguments.frames, "dirty_rects": not arguments.full_redraw,
+               "pygame": pg.version.ver, "scenarios": {}}
+
+    for name in arguments.scenarios:
+        summary = run_scenario(name, arguments.frames, screen,
+                               dirty_rects=not arguments.full_redraw)
+        results["scenarios"][name] = summary
+        print(f"{name:>17}: update p50 {summary['update']['p50']:.3f}ms "
+              f"p95 {summary['update']['p95']:.3f}ms, "
+              f"draw p50 {summary['draw']['p50']:.3f}ms p95 {summary['draw']['p95']:.3f}ms")
+
+    if arguments.output:
+        with open(arguments.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if arguments.compare:
+        with open(arguments.compare) as file:
+            baseline = json.load(file)
+        regressions = compare(results, baseline, arguments.tolerance)
+        for scenario, phase, point, before, after in regressions:
+            print(f"REGRESSION {scenario} {phase} {point}: {before:.3f}ms -> {after:.3f}ms")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against", arguments.compare)
+
+
+if __name__ == "__main__":
+    main()
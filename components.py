@@ -28,10 +28,15 @@ def snap_to_grid(mouse_x, mouse_y, x, y, spacing: int):
     return x + spacing * col, y + spacing * row"""
 
 class TrackingBoard:
-    """10*10 "tracking" grid for the player to select opponent tiles to reveal."""
+    """width*height "tracking" grid for the player to select opponent tiles to reveal."""
     def __init__(self, pos_x, pos_y, callback, arrangement, width=10, height=10):
         self.enabled = True
         self.disable_input = False
+        self.rect = pg.Rect(pos_x, pos_y, 32*width - 4, 32*height - 4)
+        self.width = width
+        self.height = height
+        self.drawn_enabled = None
+        self.engaged_tiles = []  # tiles which are hovered or pressed
 
         self.tiles = []
         for x, y, col, row in layout_grid(pos_x, pos_y, 32, width, height):
@@ -45,15 +50,141 @@ class TrackingBoard:
                                     background=C_LIGHT_ISH, background_disabled=reveal_color)
             self.tiles.append(button)
 
+    def tile_at(self, col: int, row: int):
+        return self.tiles[col*self.height + row]
+
+    def engaged(self) -> bool:
+        return bool(self.engaged_tiles)
+
     def update(self):
         pass
 
+    def dirty_rects(self):
+        if self.enabled != self.drawn_enabled:
+            return [self.rect]
+        elif not self.enabled:
+            return []
+        return [rect for tile in self.tiles for rect in tile.dirty_rects()]
+
     def draw(self, screen):
+        self.drawn_enabled = self.enabled
         if self.enabled:
             for tile in self.tiles:
                 tile.draw(screen)
 
     def mouse_event(self, event):
+        """Only the tile under the pointer, and any tiles leaving their hover
+        or press state, are passed the event: other tiles would ignore it."""
         if self.enabled and not self.disable_input:
-            for tile in self.tiles:
+            col, row = snap_to_grid(*event.pos, self.rect.x, self.rect.y, 32)
+            targets = list(self.engaged_tiles)
+            if 0 <= col < self.width and 0 <= row < self.height:
+                tile = self.tile_at(col, row)
+                if tile not in targets:
+                    targets.append(tile)
+
+            for tile in targets:
                 tile.mouse_event(event)
+            self.engaged_tiles = [tile for tile in targets if tile.engaged()]
+
+class BoardViewport:
+    """A scrollable window onto a large board (i.e. a SparseBoard). Only the
+    tiles inside the window, and inside the screen's clip area, are drawn:
+    the cost of a frame depends on the window size, not the board area.
+    Scroll with scroll() (i.e. from the arrow keys) or by dragging.
+    """
+    def __init__(self, rect, board, tile_size=10, show_ships=True):
+        self.rect = pg.Rect(rect)
+        self.board = board
+        self.tile_size = tile_size
+        self.show_ships = show_ships
+
+        self.visible_cols = min(board.width, self.rect.width // tile_size)
+        self.visible_rows = min(board.height, self.rect.height // tile_size)
+        self.col_offset, self.row_offset = 0, 0  # the tile at the top left
+        self.drag_start = None  # (mouse position, offset) while dragging
+
+        self.dirty = True
+        self.changed_rects = []
+
+        # Unrevealed water is drawn by blitting a pre-rendered window of tiles.
+        self.blank = pg.Surface(self.rect.size)
+        self.blank.fill(C_LIGHT)
+        for x, y, col, row in layout_grid(0, 0, tile_size, self.visible_cols,
+                                          self.visible_rows):
+            pg.draw.rect(self.blank, C_LIGHT_ISH, (x, y, tile_size - 1, tile_size - 1))
+
+    def scroll(self, cols: int, rows: int):
+        col_offset = max(0, min(self.board.width - self.visible_cols, self.col_offset + cols))
+        row_offset = max(0, min(self.board.height - self.visible_rows, self.row_offset + rows))
+        if (col_offset, row_offset) != (self.col_offset, self.row_offset):
+            self.col_offset, self.row_offset = col_offset, row_offset
+            self.dirty = True
+
+    def tile_rect(self, col: int, row: int):
+        """The screen rect of a board tile, or None if it is out of view."""
+        col -= self.col_offset
+        row -= self.row_offset
+        if 0 <= col < self.visible_cols and 0 <= row < self.visible_rows:
+            return pg.Rect(self.rect.x + col * self.tile_size, self.rect.y + row * self.tile_size,
+                           self.tile_size, self.tile_size)
+        return None
+
+    def tile_changed(self, col: int, row: int):
+        """Marks a tile to be redrawn, if it is in view."""
+        rect = self.tile_rect(col, row)
+        if rect is not None:
+            self.changed_rects.append(rect)
+
+    def tile_color(self, col: int, row: int):
+        """The colour of a tile, or None for unrevealed water."""
+        ship = self.board.ship_at(col, row)
+        if self.board.is_revealed(col, row):
+            if ship is None:
+                return C_DARK_BLUE
+            return C_RED if self.board.destroyed(ship) else C_YELLOW
+        elif ship is not None and self.show_ships:
+            return C_LIGHT_GREEN
+        return None
+
+    def engaged(self) -> bool:
+        return self.drag_start is not None
+
+    def update(self):
+        pass
+
+    def dirty_rects(self):
+        if self.dirty:
+            return [self.rect]
+        rects, self.changed_rects = self.changed_rects, []
+        return rects
+
+    def draw(self, screen):
+        self.dirty = False
+        self.changed_rects = []
+        screen.blit(self.blank, self.rect.topleft)
+
+        # Only look at the tiles inside the clip area (see Scene.render).
+        area = self.rect.clip(screen.get_clip())
+        first_col, first_row = snap_to_grid(area.left, area.top, *self.rect.topleft,
+                                            self.tile_size)
+        last_col, last_row = snap_to_grid(area.right - 1, area.bottom - 1, *self.rect.topleft,
+                                          self.tile_size)
+        size = self.tile_size - 1
+        for row in range(first_row, min(last_row + 1, self.visible_rows)):
+            for col in range(first_col, min(last_col + 1, self.visible_cols)):
+                color = self.tile_color(col + self.col_offset, row + self.row_offset)
+                if color is not None:
+                    pg.draw.rect(screen, color, (self.rect.x + col * self.tile_size,
+                                                 self.rect.y + row * self.tile_size, size, size))
+
+    def mouse_event(self, event):
+        """Drag to scroll."""
+        if event.type == pg.MOUSEBUTTONDOWN and self.rect.collidepoint(event.pos):
+            self.drag_start = event.pos, (self.col_offset, self.row_offset)
+        elif event.type == pg.MOUSEBUTTONUP:
+            self.drag_start = None
+        elif event.type == pg.MOUSEMOTION and self.drag_start is not None:
+            (start_x, start_y), (start_col, start_row) = self.drag_start
+            self.scroll(start_col - (event.pos[0] - start_x) // self.tile_size - self.col_offset,
+                        start_row - (event.pos[1] - start_y) // self.tile_size - self.row_offset)
@@ -1,27 +1,42 @@
-from random import choice
-from battleships import generate_blank_grid
+from random import choice, randrange, shuffle, seed as seed_random
+from collections import Counter, OrderedDict
+from functools import lru_cache
+from operator import add
+from multiprocessing import Pool, TimeoutError, cpu_count, current_process
+from time import monotonic
+from battleships import generate_blank_grid, placement_index, BitBoard
+
+try:
+    from heatmap import PriorityHeatmap, IncrementalHeatmap
+except ImportError:  # NumPy is optional: only needed by VectorOpportunityPlayer.
+    PriorityHeatmap = IncrementalHeatmap = None
 
 class OpportunityPlayer:
     """Bad idea - find the position on the grid which
-    matches the most possible ship placements and fire at it."""
+    matches the most possible ship placements and fire at it.
+    A BitBoard may be passed as both the arrangement and revealed grids."""
     def __init__(self, ships, arrangement, revealed, width=10, height=10):
         self.ships = ships
         self.arrangement = arrangement
         self.revealed = revealed
         self.width = width
         self.height = height
+        self.board = revealed if isinstance(revealed, BitBoard) else None
 
         self.priority = generate_blank_grid(0, width, height)
 
     def play_move(self):
-        if all(all(tile for tile in row) for row in self.revealed):
+        if self.board is not None:
+            if self.board.all_revealed():
+                return None, None
+        elif all(all(tile for tile in row) for row in self.revealed):
             return None, None  # all tiles have been revealed
 
         self.priority = generate_blank_grid(0, self.width, self.height)
 
         for col, row in self.revealed_grid_tiles():
-            if (self.arrangement[row][col] is not None
-                    and not self.arrangement[row][col].destroyed(self.revealed)):
+            parent_ship = self.ship_at(col, row)
+            if parent_ship is not None and not parent_ship.destroyed(self.revealed):
                 self.fit_ships_around(col, row)
 
         # Overwrite the priority of already revealed tiles with -1.
@@ -41,8 +56,17 @@ class OpportunityPlayer:
                     options.append((col, row))
         return choice(options)
 
+    def ship_at(self, col: int, row: int):
+        if self.board is not None:
+            return self.board.ship_at(col, row)
+        return self.arrangement[row][col]
+
     def revealed_grid_tiles(self):
         """Generator that yields the coordinates of all revealed tiles."""
+        if self.board is not None:
+            yield from self.board.revealed_tiles()
+            return
+
         for col in range(self.width):
             for row in range(self.height):
                 if self.revealed[row][col]:
@@ -51,34 +75,514 @@ class OpportunityPlayer:
     def fit_ships_around(self, col: int, row: int):
         """Consider all possible ship placements around the tile
         and increase the weight of tiles which hide ships in many arrangements."""
+        misses = self.board.misses() if self.board is not None else 0
+
         for ship in self.ships:
             if ship.destroyed(self.revealed):
                 continue
 
-            # Horizontal placements:
-            minimum_col = max(0, col - ship.size + 1)
-            ships_to_fit = min(ship.size, self.width - col)
+            index = placement_index(self.width, self.height, ship.size)
+            for number in placements_around(self.width, self.height, ship.size, col, row):
+                # Placement is only considered if it doesn't overlap a revealed empty tile.
+                if self.board is not None:
+                    valid = not index.masks[number] & misses
+                else:
+                    valid = all(not self.revealed[tile_row][tile_col]
+                                or self.arrangement[tile_row][tile_col]
+                                for tile_col, tile_row in index.tiles[number])
+                if valid:
+                    for tile_col, tile_row in index.tiles[number]:
+                        self.priority[tile_row][tile_col] += 1
 
-            for offset in range(ships_to_fit):
-                start = minimum_col + offset
-                ship_tiles = [tile_col for tile_col in range(start, start + ship.size)]
+@lru_cache(maxsize=4096)
+def placements_around(width, height, size, col: int, row: int):
+    """The placement numbers (in placement_index(width, height, size)) fitted
+    around a tile: from the leftmost (or uppermost) start on the board, the
+    ship is slid along by one tile at a time, once for each tile of the ship
+    that fits before the edge. Keyed by board size rather than by index, so
+    the cache doesn't keep indexes alive after placement_index evicts them."""
+    index = placement_index(width, height, size)
+    around = []
+    # Horizontal placements:
+    minimum_col = max(0, col - index.size + 1)
+    for offset in range(min(index.size, index.width - col)):
+        number = index.lookup.get((minimum_col + offset, row, True))
+        if number is not None:
+            around.append(number)
 
-                # Placement is only considered if it doesn't overlap a revealed empty tile.
-                if all(not self.revealed[row][tile_col] or self.arrangement[row][tile_col]
-                       for tile_col in ship_tiles):
-                    for tile_col in ship_tiles:
-                        self.priority[row][tile_col] += 1
+    # Vertical placements:
+    minimum_row = max(0, row - index.size + 1)
+    for offset in range(min(index.size, index.height - row)):
+        number = index.lookup.get((col, minimum_row + offset, False))
+        if number is not None:
+            around.append(number)
+    return tuple(around)
 
-            # Vertical placements:
-            minimum_row = max(0, row - ship.size + 1)
-            ships_to_fit = min(ship.size, self.height - row)
+class VectorOpportunityPlayer(OpportunityPlayer):
+    """OpportunityPlayer with its priority grid computed by the NumPy
+    engine in heatmap.py. Makes the same move choices (for the same
+    random state), with move latency that stays flat on larger boards.
+    By default the grid is updated from the tiles revealed since the
+    last move; incremental=False recomputes it in full every move."""
+    def __init__(self, ships, arrangement, revealed, width=10, height=10, incremental=True):
+        if PriorityHeatmap is None:
+            raise ImportError("VectorOpportunityPlayer requires NumPy")
+        super().__init__(ships, arrangement, revealed, width, height)
+        self.incremental = incremental
+        self.heatmap = IncrementalHeatmap(width, height)
 
-            for offset in range(ships_to_fit):
-                start = minimum_row + offset
-                ship_tiles = [tile_row for tile_row in range(start, start + ship.size)]
+    def play_move(self):
+        if self.incremental:
+            self.priority = self.heatmap.update(self.ships, self.arrangement, self.revealed)
+        else:
+            self.priority = self.heatmap.compute(self.ships, self.arrangement, self.revealed)
+        highest = self.priority.max()
 
-                # Placement is only considered if it doesn't overlap a revealed empty tile.
-                if all(not self.revealed[tile_row][col] or self.arrangement[tile_row][col]
-                       for tile_row in ship_tiles):
-                    for tile_row in ship_tiles:
-                        self.priority[tile_row][col] += 1
+        if highest == -1:  # if all tiles are revealed, give up.
+            return None, None
+        # Options are listed column by column, in the same order as OpportunityPlayer.
+        options = (self.priority.T.ravel() == highest).nonzero()[0]
+        col, row = divmod(int(choice(options)), self.height)
+        return col, row
+
+def sample_layout(sizes, blocked: int, hits: int, revealed: int, width: int, height: int):
+    """One random layout of ships of the given sizes which covers every hit
+    and avoids the blocked tiles, as (mask, weight), or None if the sampler
+    ran into a dead end. Every ship is unsunk, so each must also cover at
+    least one unrevealed tile. Ships are first fitted over uncovered hits,
+    then placed at random; each choice is uniform over the legal options, so
+    a layout's weight, the product of the numbers of options, is inversely
+    proportional to its chance of being sampled. Weighted by it, samples are
+    drawn evenly from every consistent layout.
+    """
+    remaining = list(sizes)
+    shuffle(remaining)
+    occupied = blocked
+    layout = 0
+    weight = 1
+
+    while hits:
+        lowest = hits & -hits
+        tile = lowest.bit_length() - 1
+        candidates = []
+        for i, size in enumerate(remaining):
+            index = placement_index(width, height, size)
+            for number in index.covering[tile]:
+                mask = index.masks[number]
+                if not mask & occupied and mask & ~revealed:
+                    candidates.append((i, mask))
+        if not candidates:
+            return None
+
+        i, mask = choice(candidates)
+        weight *= len(candidates)
+        remaining.pop(i)
+        occupied |= mask
+        layout |= mask
+        hits &= ~mask
+
+    # Every hit is now covered (and occupied), so the rest of the ships
+    # can only be placed on unrevealed tiles.
+    for size in remaining:
+        legal = [mask for mask in placement_index(width, height, size).masks
+                 if not mask & occupied]
+        if not legal:
+            return None
+        mask = choice(legal)
+        weight *= len(legal)
+        occupied |= mask
+        layout |= mask
+    return layout, weight
+
+def sample_counts(sizes, blocked, hits, revealed, width, height, deadline, task_seed=None):
+    """Samples layouts until the deadline, a time.monotonic() time (which is
+    comparable between processes). Returns the number of layouts sampled and
+    the total weight of those occupying each unrevealed tile (proportional to
+    the chance that it is occupied)."""
+    if task_seed is not None:
+        seed_random(task_seed)
+    counts = [0] * (width * height)
+    samples = 0
+
+    while samples == 0 or monotonic() < deadline:
+        sampled = sample_layout(sizes, blocked, hits, revealed, width, height)
+        if sampled is None:
+            if monotonic() >= deadline:
+                break
+            continue
+        samples += 1
+        layout, weight = sampled
+        layout &= ~revealed
+        while layout:
+            lowest = layout & -layout
+            counts[lowest.bit_length() - 1] += weight
+            layout ^= lowest
+    return samples, counts
+
+POOL_MARGIN = 0.005  # seconds left for sending the workers' results back
+
+class MonteCarloPlayer(OpportunityPlayer):
+    """Samples many opponent layouts consistent with what has been seen:
+    each covers every unsunk hit and avoids the misses and sunk ships.
+    Fires at the tile occupied in the most (weighted) samples. Sampling is
+    spread over a pool of worker processes (kept between moves); with
+    processes=1, or inside a worker process, sampling happens in this
+    process instead. Sampling stops in time for the results to be collected
+    within the per-move time budget, in seconds; if none arrive in time,
+    the move is OpportunityPlayer's.
+    Call close() when finished with the player, to stop the workers.
+    """
+    def __init__(self, ships, arrangement, revealed, width=10, height=10,
+                 budget=0.05, processes=None):
+        super().__init__(ships, arrangement, revealed, width, height)
+        self.budget = budget
+        self.processes = processes
+        self.pool = None
+        self.workers = processes or cpu_count()
+        self.samples = 0  # sampled for the last move
+
+    def play_move(self):
+        sizes, blocked, hits, revealed = self.constraints()
+        if not sizes:
+            return None, None
+
+        self.samples, counts = self.sample(sizes, blocked, hits, revealed)
+        move = self.most_likely(counts, revealed)
+        if self.samples == 0 or move is None:
+            return super().play_move()  # no consistent layout was found in time
+        return move
+
+    def constraints(self):
+        """(sizes of unsunk ships, blocked mask, unsunk hits mask, revealed mask):
+        misses and the tiles of sunk ships are blocked."""
+        revealed, misses, hits = self.observed_masks()
+        blocked = misses
+        sizes = []
+        for ship in self.ships:
+            if ship.destroyed(self.revealed):
+                blocked |= sum(1 << (row * self.width + col) for col, row in ship.tile_indexes())
+            else:
+                sizes.append(ship.size)
+        return sizes, blocked, hits, revealed
+
+    def most_likely(self, counts, revealed):
+        """A random choice of the unrevealed tiles with the highest count,
+        or None if every unrevealed tile has a count of 0."""
+        highest = max((count for tile, count in enumerate(counts) if not revealed >> tile & 1),
+                      default=0)
+        if highest == 0:
+            return None
+        options = [tile for tile, count in enumerate(counts)
+                   if count == highest and not revealed >> tile & 1]
+        row, col = divmod(choice(options), self.width)
+        return col, row
+
+    def observed_masks(self):
+        """(revealed, misses, unsunk hits) masks, from a BitBoard or the grids."""
+        if self.board is not None:
+            hits = self.board.revealed & self.board.occupied
+            for ship in self.ships:
+                if self.board.destroyed(ship):
+                    hits &= ~self.board.ship_masks[ship]
+            return self.board.revealed, self.board.misses(), hits
+
+        revealed = misses = hits = 0
+        for col, row in self.revealed_grid_tiles():
+            bit = 1 << (row * self.width + col)
+            revealed |= bit
+            parent_ship = self.ship_at(col, row)
+            if parent_ship is None:
+                misses |= bit
+            elif not parent_ship.destroyed(self.revealed):
+                hits |= bit
+        return revealed, misses, hits
+
+    def sample(self, sizes, blocked, hits, revealed):
+        """Samples over the worker pool, or in this process if there is none.
+        The workers stop POOL_MARGIN (at most half the budget) before the
+        budget runs out, leaving time to send their results; results which
+        arrive after it has run out are dropped, so there may be none."""
+        start = monotonic()
+        pool = self.get_pool()
+        if pool is None:
+            return sample_counts(sizes, blocked, hits, revealed, self.width, self.height,
+                                 start + self.budget)
+
+        deadline = start + self.budget
+        arguments = (sizes, blocked, hits, revealed, self.width, self.height,
+                     deadline - min(POOL_MARGIN, self.budget / 2))
+        pending = [pool.apply_async(sample_counts, arguments + (randrange(2**32),))
+                   for _worker in range(self.workers)]
+        samples = 0
+        counts = [0] * (self.width * self.height)
+        for result in pending:
+            try:
+                worker_samples, worker_counts = result.get(max(0.0, deadline - monotonic()))
+            except TimeoutError:
+                continue  # too late: the result is dropped
+            samples += worker_samples
+            counts = list(map(add, counts, worker_counts))
+        return samples, counts
+
+    def get_pool(self):
+        if self.pool is None and self.processes != 1 and not current_process().daemon:
+            self.pool = Pool(self.processes)  # daemon processes can't start a pool
+        return self.pool
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+class EnumerationLimit(Exception):
+    """Enumerating the layouts would visit more than the node limit."""
+
+class ExactPlayer(MonteCarloPlayer):
+    """Fires at the tile most likely to hide a ship, over every layout of the
+    unsunk ships consistent with what has been seen (see constraints). The
+    layouts are enumerated ship by ship: while hits are uncovered, some ship
+    must cover the lowest one, and then the rest are placed in order.
+    Partial results, keyed by the ships left, the occupied tiles and the
+    uncovered hits, are kept in a bounded cache (shared between moves).
+    When a move would take more than node_limit cache misses, which is
+    likely early in the game, the move falls back to MonteCarloPlayer.
+    """
+    def __init__(self, ships, arrangement, revealed, width=10, height=10,
+                 node_limit=3000, cache_size=20000, budget=0.05, processes=1):
+        super().__init__(ships, arrangement, revealed, width, height, budget, processes)
+        self.node_limit = node_limit
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # (sizes, occupied, uncovered) -> (layouts, tile counts)
+        self.nodes = 0
+        self.layouts = 0  # consistent layouts for the last move, 0 if it fell back
+
+    def play_move(self):
+        sizes, blocked, hits, revealed = self.constraints()
+        if not sizes:
+            return None, None
+
+        self.nodes = 0
+        try:
+            self.layouts, counts = self.enumerate(tuple(sorted(sizes, reverse=True)),
+                                                  blocked, hits)
+        except EnumerationLimit:
+            self.layouts = 0
+            return super().play_move()
+
+        move = self.most_likely(counts, revealed)
+        if move is None:
+            return super().play_move()
+        return move
+
+    def enumerate(self, sizes, occupied, uncovered):
+        """(number of layouts, number of layouts occupying each tile) for
+        ships of the given sizes (largest first) which avoid the occupied
+        tiles and cover every uncovered hit."""
+        key = (sizes, occupied, uncovered)
+        result = self.cache.get(key)
+        if result is not None:
+            self.cache.move_to_end(key)
+            return result
+
+        self.nodes += 1
+        if self.nodes > self.node_limit:
+            raise EnumerationLimit(f"more than {self.node_limit} nodes")
+
+        layouts = 0
+        counts = [0] * (self.width * self.height)
+        if not sizes:
+            layouts = int(not uncovered)
+        elif sum(sizes) >= bin(uncovered).count("1"):
+            for rest, index, number, multiplicity in self.branches(sizes, occupied, uncovered):
+                mask = index.masks[number]
+                child_layouts, child_counts = self.enumerate(rest, occupied | mask,
+                                                             uncovered & ~mask)
+                if not child_layouts:
+                    continue
+                if multiplicity != 1:
+                    child_layouts *= multiplicity
+                    child_counts = [count * multiplicity for count in child_counts]
+                layouts += child_layouts
+                counts = list(map(add, counts, child_counts))
+                for col, row in index.tiles[number]:
+                    counts[row * self.width + col] += child_layouts
+
+        result = (layouts, counts)
+        self.cache[key] = result
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
+
+    def branches(self, sizes, occupied, uncovered):
+        """The (remaining sizes, placement index, placement number, multiplicity)
+        to try next: placements of any ship over the lowest uncovered hit
+        (ships of the same size are counted once, times their multiplicity),
+        or once every hit is covered, placements of the first ship.
+        Every ship is unsunk, so it can't lie only on hits: the uncovered hits
+        are the only revealed tiles which aren't occupied."""
+        if uncovered:
+            tile = (uncovered & -uncovered).bit_length() - 1
+            for position, size in enumerate(sizes):
+                if position and sizes[position - 1] == size:
+                    continue  # already branched on this size
+                rest = sizes[:position] + sizes[position + 1:]
+                index = placement_index(self.width, self.height, size)
+                for number in index.covering[tile]:
+                    mask = index.masks[number]
+                    if not mask & occupied and mask & ~uncovered:
+                        yield rest, index, number, sizes.count(size)
+        else:
+            index = placement_index(self.width, self.height, sizes[0])
+            for number, mask in enumerate(index.masks):
+                if not mask & occupied:
+                    yield sizes[1:], index, number, 1
+
+class SparsePlayer:
+    """A computer player for very large boards (i.e. a SparseBoard), where
+    scanning every tile each move would be too slow. Like OpportunityPlayer,
+    placements fitted around unsunk hits are scored, but only in a sparse
+    dict of the tiles near those hits. With no hits to follow it fires at a
+    random unrevealed tile, found by rejection sampling on a checkerboard
+    spaced by the smallest ship afloat. Each move costs time in proportion
+    to the hits being followed, not the board area.
+    """
+    def __init__(self, ships, arrangement, revealed, width=100, height=100):
+        self.ships = ships
+        self.board = revealed  # a SparseBoard or BitBoard: arrangement is unused
+        self.width = width
+        self.height = height
+
+        self.afloat = Counter(ship.size for ship in ships)  # unsunk ships of each size
+        self.hits = set()  # tiles of unsunk ships which have been hit
+        self.blocked = set()  # misses and the tiles of sunk ships
+        self.last_shot = None
+        self.priority = {}  # (col, row) -> score, only for tiles near hits
+
+    def play_move(self):
+        self.observe_last_shot()
+        if not self.afloat:
+            return None, None
+
+        self.priority = self.score_around_hits()
+        if self.priority:
+            highest = max(self.priority.values())
+            col, row = choice([tile for tile, score in self.priority.items()
+                               if score == highest])
+        else:
+            col, row = self.random_unrevealed()
+            if col is None:
+                return None, None
+
+        self.last_shot = col, row
+        return col, row
+
+    def observe_last_shot(self):
+        """Records whether this player's last shot hit, and any ship it sank."""
+        if self.last_shot is None or not self.board.is_revealed(*self.last_shot):
+            return
+        ship = self.board.ship_at(*self.last_shot)
+        if ship is None:
+            self.blocked.add(self.last_shot)
+        elif self.board.destroyed(ship):
+            self.afloat[ship.size] -= 1
+            if not self.afloat[ship.size]:
+                del self.afloat[ship.size]
+            for tile in ship.tile_indexes():
+                self.hits.discard(tile)
+                self.blocked.add(tile)
+        else:
+            self.hits.add(self.last_shot)
+        self.last_shot = None
+
+    def score_around_hits(self):
+        """Every placement of an unsunk ship covering an unsunk hit, which
+        doesn't cover a miss or sunk ship, adds 1 to its unrevealed tiles."""
+        priority = {}
+        for hit_col, hit_row in self.hits:
+            for size, count in self.afloat.items():
+                for offset in range(size):
+                    for col, row, horizontal in ((hit_col - offset, hit_row, True),
+                                                 (hit_col, hit_row - offset, False)):
+                        tiles = [(col + i, row) if horizontal else (col, row + i)
+                                 for i in range(size)]
+                        if col < 0 or row < 0 or tiles[-1][0] >= self.width \
+                                or tiles[-1][1] >= self.height \
+                                or any(tile in self.blocked for tile in tiles):
+                            continue
+                        for tile in tiles:
+                            if not self.board.is_revealed(*tile):
+                                priority[tile] = priority.get(tile, 0) + count
+        return priority
+
+    def random_unrevealed(self, attempts=256):
+        """A random unrevealed tile, preferring a checkerboard pattern (every
+        ship covers one of its tiles). Falls back to a full scan only when
+        nearly every tile has been revealed; (None, None) if none are left."""
+        spacing = min(self.afloat)
+        for attempt in range(attempts):
+            col, row = randrange(self.width), randrange(self.height)
+            if attempt < attempts // 2 and (col + row) % spacing:
+                continue
+            if not self.board.is_revealed(col, row):
+                return col, row
+
+        options = [(col, row) for col in range(self.width) for row in range(self.height)
+                   if not self.board.is_revealed(col, row)]
+        return choice(options) if options else (None, None)
+
+# Computer players by name, i.e. for tournament.py. Each takes
+# (ships, arrangement, revealed, width, height) and has a play_move method.
+PLAYERS = {
+    "opportunity": OpportunityPlayer,
+    "monte_carlo": MonteCarloPlayer,
+    "exact": ExactPlayer,
+    "sparse": SparsePlayer,
+}
+if PriorityHeatmap is not None:
+    PLAYERS["vector_opportunity"] = VectorOpportunityPlayer
+
+def register_player(name, player_class):
+    PLAYERS[name] = player_class
+
+
+if __name__ == "__main__":
+    from itertools import product
+    from battleships import Ship, generate_layouts
+
+    def brute_force(sizes, blocked, hits, revealed, width, height):
+        """(layouts, tile counts) over every placement of every ship."""
+        layouts = 0
+        counts = [0] * (width * height)
+        for masks in product(*(placement_index(width, height, size).masks for size in sizes)):
+            layout = 0
+            for mask in masks:
+                if mask & (layout | blocked) or not mask & ~revealed:
+                    break
+                layout |= mask
+            else:
+                if not hits & ~layout:
+                    layouts += 1
+                    for tile in range(width * height):
+                        counts[tile] += (layout & ~revealed) >> tile & 1
+        return layouts, counts
+
+    # `Test: ExactPlayer.enumerate(...)` against brute force, on a 5x5 board
+    seed_random(0)
+    test_stock = [Ship(0, 0, 3, True, "A"), Ship(0, 1, 2, True, "B"), Ship(0, 2, 2, True, "C")]
+    for test_ships in generate_layouts(test_stock, width=5, height=5, count=20):
+        test_board = BitBoard.from_ships(test_ships, width=5, height=5)
+        test_tiles = [(col, row) for col in range(5) for row in range(5)]
+        shuffle(test_tiles)
+        for test_col, test_row in test_tiles[:randrange(4, 16)]:
+            test_board.reveal(test_col, test_row)
+        if test_board.all_destroyed():
+            continue
+
+        test_player = ExactPlayer(test_ships, test_board, test_board, 5, 5, node_limit=10**6)
+        test_sizes, test_blocked, test_hits, test_revealed = test_player.constraints()
+        test_layouts, test_counts = test_player.enumerate(
+            tuple(sorted(test_sizes, reverse=True)), test_blocked, test_hits)
+        assert (test_layouts, [count * (not test_revealed >> tile & 1)
+                               for tile, count in enumerate(test_counts)]) == \
+            brute_force(test_sizes, test_blocked, test_hits, test_revealed, 5, 5)
+    print("Test passed: ExactPlayer.enumerate()")
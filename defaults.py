@@ -28,3 +28,15 @@ board_width = 10
 board_height = 10
 
 bonus_turn_on_hit = True
+
+# Record every game to a binary log in this directory (see game_log.py), or None.
+game_log_directory = None
+
+# Only redraw and update the parts of the screen that changed each frame.
+dirty_rect_rendering = True
+
+# Large-board mode (see scenes.LargeBoard): a sparse board with many ships.
+large_board_width = 100
+large_board_height = 100
+large_board_fleets = 40  # copies of the default ships
+large_board_shots_per_frame = 10
@@ -0,0 +1,255 @@
+"""An append-only binary log of a game (the layouts of both players, then
+every reveal in order) and a headless replayer which can seek to any move.
+
+    header   "BSGL", version, board width, board height, game mode
+    events   type, player, payload length, then the payload:
+             layout  ship count, ship records (see layout_format), name table
+             reveal  col, row (of the given player's board)
+
+Events are flushed as they are written, so a log survives a crash.
+"""
+from datetime import datetime
+import os
+import struct
+
+from battleships import Ship, BitBoard
+from layout_format import RECORD, NameTable
+
+HEADER = struct.Struct("<4sHHHB")  # magic, version, width, height, mode
+EVENT = struct.Struct("<BBH")  # type, player, payload length
+COUNT = struct.Struct("<H")
+TILE = struct.Struct("<HH")
+MAGIC = b"BSGL"
+VERSION = 1
+LayoutEvent, RevealEvent = 1, 2
+
+SNAPSHOT_INTERVAL = 64  # reveals between the replayer's snapshots
+
+class GameLog:
+    """Writes a game's events to an append-only log file."""
+    def __init__(self, path, width, height, mode=0):
+        self.path = path
+        self.file = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(HEADER.pack(MAGIC, VERSION, width, height, mode))
+            self.file.flush()
+
+    def write_event(self, event_type, player, payload):
+        self.file.write(EVENT.pack(event_type, player, len(payload)) + payload)
+        self.file.flush()
+
+    def layout(self, player, ships):
+        names = NameTable()
+        records = b"".join(RECORD.pack(ship.origin_col, ship.origin_row, ship.size,
+                                       ship.horizontal, names.intern(ship.name))
+                           for ship in ships)
+        self.write_event(LayoutEvent, player, COUNT.pack(len(ships)) + records
+                         + COUNT.pack(len(names)) + names.to_bytes())
+
+    def reveal(self, player, col, row):
+        """Records a reveal of a tile on the player's board."""
+        self.write_event(RevealEvent, player, TILE.pack(col, row))
+
+    def close(self):
+        self.file.close()
+
+def open_game_log(directory, width, height, mode=0):
+    """A new GameLog in the directory, named by the time; None if directory is None."""
+    if directory is None:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    name = datetime.now().strftime("game-%Y%m%d-%H%M%S-%f.bsgl")
+    return GameLog(os.path.join(directory, name), width, height, mode)
+
+def read_game_log(data):
+    """Parses a log: returns (width, height, mode, layouts, reveals), where
+    layouts is a list of ships per player and reveals a list of (player, col, row)."""
+    magic, version, width, height, mode = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"not a version {VERSION} game log")
+
+    layouts = [[], []]
+    reveals = []
+    offset = HEADER.size
+    while offset + EVENT.size <= len(data):
+        event_type, player, length = EVENT.unpack_from(data, offset)
+        offset += EVENT.size
+        if offset + length > len(data):
+            break  # the last event was cut short (i.e. by a crash)
+
+        if event_type == RevealEvent:
+            col, row = TILE.unpack_from(data, offset)
+            reveals.append((player, col, row))
+        elif event_type == LayoutEvent:
+            (count,) = COUNT.unpack_from(data, offset)
+            records_end = offset + COUNT.size + count * RECORD.size
+            (name_count,) = COUNT.unpack_from(data, records_end)
+            names, _end = NameTable.from_buffer(data, records_end + COUNT.size, name_count)
+            layouts[player] = [Ship(col, row, size, bool(horizontal), names[name_id])
+                               for col, row, size, horizontal, name_id in RECORD.iter_unpack(
+                                   data[offset + COUNT.size:records_end])]
+        offset += length
+    return width, height, mode, layouts, reveals
+
+class GameReplay:
+    """Replays a logged game headlessly on BitBoards. The revealed masks of
+    both boards are snapshot every SNAPSHOT_INTERVAL reveals, so seek() to
+    any move restores the nearest snapshot and applies fewer than
+    SNAPSHOT_INTERVAL reveals. The game is won on the move which first sinks
+    every ship of a board: shots after it (i.e. the computer's last shot in
+    ModeComputer) don't change the winner.
+    """
+    def __init__(self, path=None, data=None):
+        if data is None:
+            with open(path, "rb") as file:
+                data = file.read()
+        self.width, self.height, self.mode, self.p_ships, self.reveals = read_game_log(data)
+        self.p_boards = tuple(BitBoard.from_ships(ships, self.width, self.height)
+                              for ships in self.p_ships)
+
+        self.move = 0  # the number of reveals applied
+        self.snapshots = [(0, 0)]  # revealed masks after every SNAPSHOT_INTERVAL moves
+        self.won = None  # (move, winner) once a board has been fully sunk
+
+    def __len__(self):
+        return len(self.reveals)
+
+    def step(self):
+        """Applies the next reveal; returns the ship hit (None for a miss)."""
+        player, col, row = self.reveals[self.move]
+        board = self.p_boards[player]
+        parent_ship = board.reveal(col, row)
+        self.move += 1
+        if self.won is None and parent_ship is not None and board.all_destroyed():
+            # In single board mode (0), the player fires at their own board.
+            self.won = self.move, player if self.mode == 0 else int(not player)
+
+        if self.move % SNAPSHOT_INTERVAL == 0 and \
+                len(self.snapshots) == self.move // SNAPSHOT_INTERVAL:
+            self.snapshots.append(tuple(board.revealed for board in self.p_boards))
+        return parent_ship
+
+    def run(self):
+        """Replays every remaining move."""
+        while self.move < len(self.reveals):
+            self.step()
+        return self
+
+    def seek(self, move):
+        """Sets the boards to how they were after the given number of reveals."""
+        move = max(0, min(move, len(self.reveals)))
+        snapshot = min(move // SNAPSHOT_INTERVAL, len(self.snapshots) - 1)
+        if not snapshot * SNAPSHOT_INTERVAL <= self.move <= move:
+            for board, revealed in zip(self.p_boards, self.snapshots[snapshot]):
+                board.revealed = revealed
+            self.move = snapshot * SNAPSHOT_INTERVAL
+        while self.move < move:
+            self.step()
+        return self
+
+    @property
+    def winner(self):
+        """None for undecided (as of the current move), 0 for player 1, 1 for player 2."""
+        if self.won is not None and self.won[0] <= self.move:
+            return self.won[1]
+        return None
+
+
+def self_test():
+    import tempfile
+    from random import seed, shuffle
+    from battleships import default_ships, generate_layouts
+
+    def ship_tuples(ships):
+        return [(ship.origin_col, ship.origin_row, ship.size, ship.horizontal, ship.name)
+                for ship in ships]
+
+    # A two board game (mode 1) which player 1 wins by sinking board 1; then,
+    # as the computer does in ModeComputer, player 2 fires on and sinks board 0.
+    seed(0)
+    test_layouts = list(generate_layouts(default_ships(), count=2))
+    test_boards = [BitBoard.from_ships(ships, 10, 10) for ships in test_layouts]
+    test_tiles = [[(col, row) for col in range(10) for row in range(10)] for _board in (0, 1)]
+    for tiles in test_tiles:
+        shuffle(tiles)
+    # Until board 1 is sunk, player 2 only fires at water on board 0.
+    test_water = [tile for tile in test_tiles[0] if test_boards[0].ship_at(*tile) is None]
+    test_reveals = []
+    while not test_boards[1].all_destroyed():
+        col, row = test_tiles[1].pop()
+        test_boards[1].reveal(col, row)
+        test_reveals.append((1, col, row))
+        if test_water and not test_boards[1].all_destroyed():
+            col, row = test_water.pop()
+            test_tiles[0].remove((col, row))
+            test_reveals.append((0, col, row))
+    test_reveals += [(0, col, row) for col, row in test_tiles[0]]
+    assert len(test_reveals) > 2 * SNAPSHOT_INTERVAL
+
+    # `Test: GameLog` and `read_game_log(data)`
+    test_path = os.path.join(tempfile.mkdtemp(), "test.bsgl")
+    test_log = GameLog(test_path, 10, 10, mode=1)
+    for player, ships in enumerate(test_layouts):
+        test_log.layout(player, ships)
+    for board, col, row in test_reveals:
+        test_log.reveal(board, col, row)
+    test_log.close()
+    with open(test_path, "rb") as file:
+        test_data = file.read()
+    width, height, mode, layouts, reveals = read_game_log(test_data)
+    assert (width, height, mode, reveals) == (10, 10, 1, test_reveals)
+    assert [ship_tuples(ships) for ships in layouts] == \
+        [ship_tuples(ships) for ships in test_layouts]
+    # A log cut short by a crash reads up to its last whole event.
+    assert read_game_log(test_data[:-1])[4] == test_reveals[:-1]
+    print("Test passed: GameLog, read_game_log()")
+
+    # `Test: GameReplay.seek(move)` and `GameReplay.winner`
+    test_replay = GameReplay(test_path)
+    assert test_replay.run().move == len(test_reveals)
+    assert test_replay.winner == 0  # though both boards are now sunk
+    won_at = test_replay.won[0]
+    for move in (0, 1, 63, 64, 65, 129, 128, won_at - 1, won_at, len(test_reveals), 5, 200):
+        expected = GameReplay(data=test_data).seek(move)
+        test_replay.seek(move)
+        assert [board.revealed for board in test_replay.p_boards] == \
+            [board.revealed for board in expected.p_boards]
+        assert test_replay.winner == expected.winner == (0 if move >= won_at else None)
+    os.remove(test_path)
+    print("Test passed: GameReplay.seek(), GameReplay.winner")
+
+
+if __name__ == "__main__":
+    import argparse
+    from time import perf_counter
+
+    parser = argparse.ArgumentParser(description="Replay logged games headlessly "
+                                                 "(with no paths, run the self-test).")
+    parser.add_argument("paths", nargs="*", help="game log files")
+    parser.add_argument("--seek", type=int, help="show the state after this many moves")
+    args = parser.parse_args()
+    if not args.paths:
+        self_test()
+        raise SystemExit
+
+    started = perf_counter()
+    moves = 0
+    wins = [0, 0]
+    for log_path in args.paths:
+        replay = GameReplay(log_path)
+        if args.seek is not None:
+            replay.seek(args.seek)
+            sunk = [sum(board.destroyed(ship) for ship in ships)
+                    for board, ships in zip(replay.p_boards, replay.p_ships)]
+            print(f"{log_path}: move {replay.move} of {len(replay)}, ships sunk on each "
+                  f"board {sunk}, winner {replay.winner}")
+            continue
+        replay.run()
+        moves += len(replay)
+        if replay.winner is not None:
+            wins[replay.winner] += 1
+
+    if args.seek is None:
+        elapsed = perf_counter() - started
+        print(f"Replayed {len(args.paths)} games ({moves} moves) in {elapsed:.2f}s")
+        print(f"Wins: player 1 {wins[0]}, player 2 {wins[1]}")
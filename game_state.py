@@ -0,0 +1,178 @@
+"""A make/unmake game state for search-based computer players. The state of
+both boards lives in preallocated bytearrays and counters, so apply_shot
+and undo_shot only overwrite entries in place: a search can explore a
+move and take it back without copying any grids.
+"""
+from battleships import placement_index
+from defaults import board_width, board_height, bonus_turn_on_hit
+
+class GameState:
+    """Both players' boards, whose turn it is and the winner, following the
+    same rules as simulation.Match. Tiles are flat indexes, row*width + col,
+    and ships are numbered by their position in the player's list of ships.
+    Sunk ships and the winner are tracked incrementally, from per-ship hit
+    counters.
+    """
+    def __init__(self, player_ships, width=board_width, height=board_height):
+        self.p_ships = player_ships
+        self.width = width
+        self.height = height
+        area = width * height
+
+        # Per board: tile -> ship number + 1 (0 for water), and tile -> revealed.
+        self.ship_tiles = (bytearray(area), bytearray(area))
+        self.revealed = (bytearray(area), bytearray(area))
+        self.ship_sizes = tuple([ship.size for ship in ships] for ships in player_ships)
+        self.ship_hits = tuple([0] * len(ships) for ships in player_ships)
+        self.ships_afloat = [len(player_ships[0]), len(player_ships[1])]
+
+        for board, ships in enumerate(player_ships):
+            if len(ships) > 254:
+                raise ValueError("at most 254 ships can be stored per board")
+            for number, ship in enumerate(ships):
+                index = placement_index(width, height, ship.size)
+                if index.find(ship) is None:
+                    raise ValueError(f"ship {number} is out of bounds")
+                for col, row in ship.tile_indexes():
+                    if self.ship_tiles[board][row * width + col]:
+                        raise ValueError(f"ship {number} overlaps another ship")
+                    self.ship_tiles[board][row * width + col] = number + 1
+
+        self.turn = 0  # 0 for player 1, 1 for player 2
+        self.winner = None  # None for undecided, 0 for player 1, 1 for player 2
+        self.shots = [0, 0]
+
+        # Undo stack: each shot's tile and the turn it was fired in. Every
+        # tile of both boards can be revealed once, so it never grows.
+        self.undo_tiles = [0] * (2 * area)
+        self.undo_turns = bytearray(2 * area)
+        self.depth = 0
+
+    @classmethod
+    def from_match(cls, match):
+        """A GameState with the same ships and revealed tiles as a
+        simulation.Match (the turn, shots and winner are copied too)."""
+        state = cls(match.p_ships, match.width, match.height)
+        for board, bit_board in enumerate(match.p_boards):
+            for col, row in bit_board.revealed_tiles():
+                tile = row * match.width + col
+                state.revealed[board][tile] = 1
+                ship = state.ship_tiles[board][tile] - 1
+                if ship >= 0:
+                    state.ship_hits[board][ship] += 1
+                    if state.ship_hits[board][ship] == state.ship_sizes[board][ship]:
+                        state.ships_afloat[board] -= 1
+        state.turn = match.turn
+        state.winner = match.winner
+        state.shots = list(match.shots)
+        return state
+
+    def tile(self, col: int, row: int) -> int:
+        return row * self.width + col
+
+    def apply_shot(self, tile: int) -> int:
+        """The current player fires at a tile of the opponent's board.
+        Returns the number of the ship hit, or -1 for a miss. The tile
+        must be a legal shot (see legal_shots), and the game not over.
+        """
+        turn = self.turn
+        board = 1 - turn
+        self.revealed[board][tile] = 1
+        self.shots[turn] += 1
+        self.undo_tiles[self.depth] = tile
+        self.undo_turns[self.depth] = turn
+        self.depth += 1
+
+        ship = self.ship_tiles[board][tile] - 1
+        if ship >= 0:
+            hits = self.ship_hits[board]
+            hits[ship] += 1
+            if hits[ship] == self.ship_sizes[board][ship]:
+                self.ships_afloat[board] -= 1
+                if not self.ships_afloat[board]:
+                    self.winner = turn
+                    return ship
+            if not bonus_turn_on_hit:
+                self.turn = board
+        else:
+            self.turn = board
+        return ship
+
+    def undo_shot(self):
+        """Takes back the last shot applied."""
+        self.depth -= 1
+        tile = self.undo_tiles[self.depth]
+        turn = self.undo_turns[self.depth]
+        board = 1 - turn
+
+        self.revealed[board][tile] = 0
+        self.shots[turn] -= 1
+        ship = self.ship_tiles[board][tile] - 1
+        if ship >= 0:
+            hits = self.ship_hits[board]
+            if hits[ship] == self.ship_sizes[board][ship]:
+                self.ships_afloat[board] += 1
+            hits[ship] -= 1
+        self.turn = turn
+        self.winner = None
+
+    def is_legal(self, tile: int) -> bool:
+        return self.winner is None and not self.revealed[1 - self.turn][tile]
+
+    def legal_shots(self):
+        """Generator of the tiles the current player may fire at."""
+        if self.winner is not None:
+            return
+        revealed = self.revealed[1 - self.turn]
+        tile = revealed.find(0)
+        while tile != -1:
+            yield tile
+            tile = revealed.find(0, tile + 1)
+
+    def sunk(self, board: int, ship: int) -> bool:
+        return self.ship_hits[board][ship] == self.ship_sizes[board][ship]
+
+
+if __name__ == "__main__":
+    from random import choice, seed
+    from time import perf_counter
+    from simulation import random_match
+
+    # `Test: GameState follows simulation.Match`
+    seed(0)
+    for _game in range(50):
+        test_match = random_match()
+        test_state = GameState.from_match(test_match)
+        while test_match.winner is None:
+            test_tile = choice(list(test_state.legal_shots()))
+            test_col, test_row = test_tile % test_state.width, test_tile // test_state.width
+            test_hit = test_match.reveal(test_col, test_row)
+            assert (test_state.apply_shot(test_tile) >= 0) == (test_hit is not None)
+            assert (test_state.turn, test_state.winner, test_state.shots) == \
+                (test_match.turn, test_match.winner, test_match.shots)
+        assert not list(test_state.legal_shots())
+
+        # Undo every shot: the state is as new again.
+        while test_state.depth:
+            test_state.undo_shot()
+        assert test_state.turn == 0 and test_state.winner is None and test_state.shots == [0, 0]
+        assert not any(test_state.revealed[0]) and not any(test_state.revealed[1])
+        assert test_state.ships_afloat == [5, 5]
+        assert all(hits == 0 for board in test_state.ship_hits for hits in board)
+    print("Test passed: GameState apply_shot(), undo_shot()")
+
+    # Speed: apply and undo every legal shot, two plies deep, from a new game.
+    test_state = GameState(random_match().p_ships)
+    nodes = 0
+    started = perf_counter()
+    for _repeat in range(20):
+        for first_tile in test_state.legal_shots():
+            test_state.apply_shot(first_tile)
+            for second_tile in test_state.legal_shots():
+                test_state.apply_shot(second_tile)
+                test_state.undo_shot()
+                nodes += 1
+            test_state.undo_shot()
+            nodes += 1
+    elapsed = perf_counter() - started
+    print(f"{nodes} apply/undo pairs in {elapsed:.2f}s ({nodes / elapsed:.0f} per second)")
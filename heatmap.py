@@ -0,0 +1,282 @@
+"""A NumPy engine for OpportunityPlayer's priority heatmap. Ship placements
+are precomputed once per board size and ship length, so each heatmap is
+built with array operations instead of nested Python loops over tiles."""
+from collections import Counter
+from functools import lru_cache
+
+import numpy as np
+
+from battleships import placement_index, BitBoard
+
+def fit_starts(position: int, size: int, length: int):
+    """The start positions OpportunityPlayer.fit_ships_around tries along
+    one axis for a tile at position (only those that are in bounds)."""
+    minimum = max(0, position - size + 1)
+    for offset in range(min(size, length - position)):
+        start = minimum + offset
+        if start + size <= length:
+            yield start
+
+class PlacementMasks:
+    """Every in-bounds placement of a 1 x size ship on the board, and
+    the placements that are fitted around each tile of the board.
+    Tiles are flat indexes, row * width + col.
+    """
+    def __init__(self, width, height, size):
+        index = placement_index(width, height, size)
+        self.size = size
+        self.placements = index.placements  # (col, row, horizontal) of each placement
+        lookup = index.lookup
+
+        # The tiles covered by each placement, one row per placement.
+        self.cover = np.array(
+            [[row * width + col for col, row in tiles] for tiles in index.tiles],
+            dtype=np.intp).reshape(-1, size)
+
+        # Pairs of (tile, placement) for each placement fitted around a tile.
+        around_tiles, around_placements = [], []
+        for row in range(height):
+            for col in range(width):
+                for start in fit_starts(col, size, width):
+                    around_tiles.append(row * width + col)
+                    around_placements.append(lookup[start, row, True])
+                for start in fit_starts(row, size, height):
+                    around_tiles.append(row * width + col)
+                    around_placements.append(lookup[col, start, False])
+        self.around_tiles = np.array(around_tiles, dtype=np.intp)
+        self.around_placements = np.array(around_placements, dtype=np.intp)
+
+        # Per-tile lookups: the placements covering a tile, and fitted around it.
+        area = width * height
+        self.covering, self.covering_starts = group_by_tile(
+            self.cover.ravel(), np.repeat(np.arange(len(self.placements)), size), area)
+        self.fitted, self.fitted_starts = group_by_tile(
+            self.around_tiles, self.around_placements, area)
+
+    def covering_tile(self, tile: int):
+        return self.covering[self.covering_starts[tile]:self.covering_starts[tile + 1]]
+
+    def fitted_around_tile(self, tile: int):
+        return self.fitted[self.fitted_starts[tile]:self.fitted_starts[tile + 1]]
+
+def group_by_tile(tiles, placements, area):
+    """Sorts (tile, placement) pairs by tile, so the placements of tile t
+    are the slice placements[starts[t]:starts[t + 1]]."""
+    order = np.argsort(tiles, kind="stable")
+    starts = np.zeros(area + 1, dtype=np.intp)
+    np.cumsum(np.bincount(tiles, minlength=area), out=starts[1:])
+    return placements[order], starts
+
+@lru_cache(maxsize=64)
+def placement_masks(width, height, size) -> PlacementMasks:
+    return PlacementMasks(width, height, size)
+
+def mask_to_array(mask: int, area: int):
+    """Unpacks a BitBoard mask into a flat array of booleans."""
+    packed = np.frombuffer(mask.to_bytes((area + 7) // 8, "little"), dtype=np.uint8)
+    return np.unpackbits(packed, bitorder="little")[:area].astype(bool)
+
+def board_state(ships, arrangement, revealed, width, height):
+    """Flat (revealed, misses, unsunk_hits) arrays of the board, read
+    from either a BitBoard or the nested-list grids."""
+    area = width * height
+    if isinstance(revealed, BitBoard):
+        hits = revealed.revealed & revealed.occupied
+        for ship in ships:
+            if revealed.destroyed(ship):
+                hits &= ~revealed.ship_masks[ship]
+        return (mask_to_array(revealed.revealed, area), mask_to_array(revealed.misses(), area),
+                mask_to_array(hits, area))
+
+    revealed_tiles = np.array(revealed, dtype=bool).reshape(area)
+    occupied = np.array([[tile is not None for tile in row] for row in arrangement],
+                        dtype=bool).reshape(area)
+    hits = revealed_tiles & occupied
+    for ship in ships:
+        if ship.destroyed(revealed):
+            for col, row in ship.tile_indexes():
+                hits[row * width + col] = False
+    return revealed_tiles, revealed_tiles & ~occupied, hits
+
+class PriorityHeatmap:
+    """Computes the same priority grid as OpportunityPlayer.play_move:
+    for each unsunk ship, every placement fitted around an unsunk hit
+    that doesn't overlap a revealed empty tile adds 1 to its tiles.
+    """
+    def __init__(self, width=10, height=10):
+        self.width = width
+        self.height = height
+        self.area = width * height
+
+    def compute(self, ships, arrangement, revealed):
+        """Returns the (height, width) priority array, with -1 for revealed tiles."""
+        revealed_tiles, misses, hits = board_state(ships, arrangement, revealed,
+                                                   self.width, self.height)
+        sizes = Counter(ship.size for ship in ships if not ship.destroyed(revealed))
+
+        heat = np.zeros(self.area)
+        for size, count in sizes.items():
+            masks = placement_masks(self.width, self.height, size)
+            if not len(masks.placements):
+                continue
+
+            valid = ~misses[masks.cover].any(axis=1)
+            # The number of unsunk hits each placement is fitted around.
+            fitted = np.bincount(masks.around_placements[hits[masks.around_tiles]],
+                                 minlength=len(masks.placements))
+            weights = np.repeat(count * fitted * valid, size)
+            heat += np.bincount(masks.cover.ravel(), weights=weights, minlength=self.area)
+
+        priority = heat.astype(np.int64)
+        priority[revealed_tiles] = -1
+        return priority.reshape(self.height, self.width)
+
+class IncrementalHeatmap(PriorityHeatmap):
+    """PriorityHeatmap which is updated from the tiles revealed since the
+    last update, instead of being rebuilt every move. For every placement
+    it keeps whether it is still valid and how many unsunk hits it is
+    fitted around, so a reveal only touches the placements crossing it.
+    compute() remains as the full recompute path, see check().
+    """
+    def __init__(self, width=10, height=10):
+        super().__init__(width, height)
+        self.ships = None
+
+    def reset(self, ships):
+        self.ships = ships
+        self.counts = Counter(ship.size for ship in ships)  # unsunk ships of each size
+        self.masks = {size: placement_masks(self.width, self.height, size)
+                      for size in self.counts}
+        self.valid = {size: np.ones(len(masks.placements), dtype=bool)
+                      for size, masks in self.masks.items()}
+        self.fitted = {size: np.zeros(len(masks.placements), dtype=np.int64)
+                       for size, masks in self.masks.items()}
+
+        self.hits = set()  # tiles of unsunk ships which have been hit
+        self.sunk = set()
+        self.heat = np.zeros(self.area, dtype=np.int64)
+        self.seen = np.zeros(self.area, dtype=bool)  # revealed tiles already applied
+        self.seen_mask = 0
+
+    def update(self, ships, arrangement, revealed):
+        """Applies any newly revealed tiles, and returns the (height, width)
+        priority array, with -1 for revealed tiles."""
+        if ships is not self.ships:
+            self.reset(ships)
+        tiles = self.new_reveals(revealed)
+        if tiles is None:  # tiles have been hidden again (i.e. a new game)
+            self.reset(ships)
+            tiles = self.new_reveals(revealed)
+
+        newly_sunk = []
+        for tile in tiles:
+            self.seen[tile] = True
+            if isinstance(revealed, BitBoard):
+                ship = revealed.tile_ships.get(tile)
+            else:
+                ship = arrangement[tile // self.width][tile % self.width]
+
+            if ship is None:
+                self.invalidate(tile)
+            elif not ship.destroyed(revealed):
+                self.add_hit(tile)
+            elif ship not in self.sunk:
+                self.sunk.add(ship)
+                newly_sunk.append(ship)
+
+        for ship in newly_sunk:
+            self.sink(ship)
+
+        return np.where(self.seen, -1, self.heat).reshape(self.height, self.width)
+
+    def check(self, ships, arrangement, revealed) -> bool:
+        """Checks the incremental heatmap against a full recompute."""
+        return np.array_equal(self.update(ships, arrangement, revealed),
+                              self.compute(ships, arrangement, revealed))
+
+    def new_reveals(self, revealed):
+        """The flat indexes of tiles revealed since the last update,
+        or None if any previously revealed tile is now hidden."""
+        if isinstance(revealed, BitBoard):
+            if self.seen_mask & ~revealed.revealed:
+                return None
+            new = revealed.revealed & ~self.seen_mask
+            self.seen_mask = revealed.revealed
+
+            tiles = []
+            while new:
+                lowest = new & -new
+                tiles.append(lowest.bit_length() - 1)
+                new ^= lowest
+            return tiles
+
+        current = np.array(revealed, dtype=bool).reshape(self.area)
+        if (self.seen & ~current).any():
+            return None
+        return np.flatnonzero(current & ~self.seen).tolist()
+
+    def spread(self, size, placements, weights):
+        """Adds each placement's weight to every tile that it covers."""
+        tiles = self.masks[size].cover[placements].ravel()
+        np.add.at(self.heat, tiles, np.repeat(weights, size))
+
+    def invalidate(self, tile: int):
+        """A revealed empty tile: placements crossing it are no longer valid."""
+        for size, count in self.counts.items():
+            crossing = self.masks[size].covering_tile(tile)
+            newly_invalid = crossing[self.valid[size][crossing]]
+            if len(newly_invalid):
+                self.valid[size][newly_invalid] = False
+                self.spread(size, newly_invalid, -count * self.fitted[size][newly_invalid])
+
+    def add_hit(self, tile: int, change=1):
+        if change > 0:
+            self.hits.add(tile)
+        else:
+            self.hits.discard(tile)
+
+        for size, count in self.counts.items():
+            around = self.masks[size].fitted_around_tile(tile)
+            self.fitted[size][around] += change
+            self.spread(size, around, change * count * self.valid[size][around])
+
+    def sink(self, ship):
+        """A sunk ship's hits no longer count, and nor do its placements."""
+        for col, row in ship.tile_indexes():
+            if row * self.width + col in self.hits:
+                self.add_hit(row * self.width + col, -1)
+
+        self.counts[ship.size] -= 1
+        live = np.flatnonzero(self.fitted[ship.size] * self.valid[ship.size])
+        self.spread(ship.size, live, -self.fitted[ship.size][live])
+
+
+if __name__ == "__main__":
+    from random import seed, shuffle
+    from battleships import default_ships, generate_blank_grid, generate_layouts
+
+    # `Test: IncrementalHeatmap matches a full recompute after every shot`
+    seed(0)
+    for test_width, test_height in (10, 10), (8, 6):
+        for test_ships in generate_layouts(default_ships(), test_width, test_height, count=20):
+            test_tiles = [(col, row) for row in range(test_height) for col in range(test_width)]
+            shuffle(test_tiles)
+
+            # On a BitBoard, and on the nested-list grids of the same layout.
+            test_board = BitBoard.from_ships(test_ships, test_width, test_height)
+            test_arrangement = generate_blank_grid(None, test_width, test_height)
+            for test_ship in test_ships:
+                for test_col, test_row in test_ship.tile_indexes():
+                    test_arrangement[test_row][test_col] = test_ship
+            test_revealed = generate_blank_grid(False, test_width, test_height)
+
+            board_heatmap = IncrementalHeatmap(test_width, test_height)
+            grid_heatmap = IncrementalHeatmap(test_width, test_height)
+            for test_col, test_row in test_tiles:
+                test_board.reveal(test_col, test_row)
+                test_revealed[test_row][test_col] = True
+                assert board_heatmap.check(test_ships, test_board, test_board)
+                assert grid_heatmap.check(test_ships, test_arrangement, test_revealed)
+                if test_board.all_destroyed():
+                    break
+    print("Test passed: IncrementalHeatmap.check()")
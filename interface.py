@@ -28,21 +28,26 @@ def specify_color(style, try_key, fallback_key, saturation=0.0):
 
 class Button:
     idle, hover, press = range(3)
+    disabled, toggled = 3, 4  # palette keys only, not mouse states
 
     def __init__(self, rect, message, callback=None, **kwargs):
         self.rect = pg.Rect(rect)
         self.callback = callback
         self.message = message
 
+        self.enabled = True  # Enable or disable handling input.
+        self.visible = True  # Show or hide the button. Still handles input when hidden!
+        self.state = Button.idle
+
+        # For dirty-rect rendering: set dirty to force a redraw.
+        self.dirty = True
+        self.drawn_appearance = None
+
         self.style = {
             'color': COLOR_DEFAULT,
             'background': BACKGROUND_DEFAULT
         }
-        self.style.update(kwargs)
-
-        self.enabled = True  # Enable or disable handling input.
-        self.visible = True  # Show or hide the button. Still handles input when hidden!
-        self.state = Button.idle
+        self.set_style(**kwargs)
 
         # Pre-render text.
         text.render(self.message, color=self.style['color'], save_sprite=True)
@@ -61,6 +66,8 @@ class Button:
             if mouse_over and self.callback:
                 self.on_click()
             self.state = Button.idle
+            if not self.enabled:  # disabled by its callback: stays idle
+                return
 
         if mouse_over:
             if event.type == MOUSEBUTTONDOWN:
@@ -73,30 +80,74 @@ class Button:
     def on_click(self):
         self.callback()
 
+    def engaged(self) -> bool:
+        """True while enabled and hovered or pressed, when mouse events
+        away from the button can still change its state."""
+        return self.enabled and self.state != Button.idle
+
     def update(self):
         pass
 
+    def appearance(self):
+        """Everything that changes how the button is drawn."""
+        return self.visible, self.enabled, self.state, self.message
+
+    def dirty_rects(self):
+        """The regions that have changed since the button was last drawn."""
+        if self.dirty or self.appearance() != self.drawn_appearance:
+            return [self.rect]
+        return []
+
+    def set_style(self, **kwargs):
+        """Updates the style. Colours of every state are resolved here, once,
+        rather than every frame; pre-rendered sprites are cleared."""
+        self.style.update(kwargs)
+        self.palette = self.resolve_palette()
+        self.sprites = {}  # (palette key, message) -> pre-rendered button
+        self.dirty = True
+
+    def resolve_palette(self):
+        """The (background, text) colours of each palette key."""
+        style = self.style
+        return {
+            Button.idle: (style['background'], style['color']),
+            Button.hover: (modify_color(style['background'], -14.4), style['color']),
+            Button.press: (modify_color(style['background'], 14.4), style['color']),
+            Button.disabled: (specify_color(style, 'background_disabled', 'background', -28.8),
+                              specify_color(style, 'color_disabled', 'color', -20))
+        }
+
+    def palette_key(self):
+        if not self.enabled:
+            return Button.disabled
+        return self.state
+
     def draw(self, screen):
-        if self.visible:
-            box_color = self.background_color()
-            color = self.text_color()
+        self.dirty = False
+        self.drawn_appearance = self.appearance()
 
-            text.box(screen, self.message, self.rect.topleft,
-                     self.rect.width, self.rect.height, True, box_color, color=color)
+        if self.visible:
+            screen.blit(self.sprite(), self.rect.topleft)
+
+    def sprite(self):
+        """The button in its current state, rendered on first use."""
+        key = (self.palette_key(), self.message)
+        sprite = self.sprites.get(key)
+
+        if sprite is None:
+            sprite = pg.Surface(self.rect.size)
+            if pg.display.get_surface() is not None:
+                sprite = sprite.convert()
+            text.box(sprite, self.message, (0, 0), self.rect.width, self.rect.height, True,
+                     self.background_color(), color=self.text_color())
+            self.sprites[key] = sprite
+        return sprite
 
     def background_color(self):
-        if not self.enabled:
-            return specify_color(self.style, 'background_disabled', 'background', -28.8)
-        elif self.state == Button.hover:
-            return modify_color(self.style['background'], -14.4)
-        elif self.state == Button.press:
-            return modify_color(self.style['background'], 14.4)
-        return self.style['background']
+        return self.palette[self.palette_key()][0]
 
     def text_color(self):
-        if not self.enabled:
-            return specify_color(self.style, 'color_disabled', 'color', -20)
-        return self.style['color']
+        return self.palette[self.palette_key()][1]
 
 class Toggle(Button):
     def __init__(self, rect, message, callback=None, checked=False, **kwargs):
@@ -107,14 +158,17 @@ class Toggle(Button):
         self.checked = not self.checked  # Flip the toggle value.
         self.callback(self.checked)
 
-    def background_color(self):
-        if self.checked:
-            return specify_color(self.style, 'background_toggle', 'background', -20)
-        else:
-            return super().background_color()
+    def appearance(self):
+        return super().appearance() + (self.checked,)
 
-    def text_color(self):
+    def resolve_palette(self):
+        palette = super().resolve_palette()
+        palette[Button.toggled] = (
+            specify_color(self.style, 'background_toggle', 'background', -20),
+            specify_color(self.style, 'color_toggle', 'color'))
+        return palette
+
+    def palette_key(self):
         if self.checked:
-            return specify_color(self.style, 'color_toggle', 'color')
-        else:
-            return super().text_color()
+            return Button.toggled
+        return super().palette_key()
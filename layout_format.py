@@ -0,0 +1,260 @@
+"""A compact binary layout format, in place of encode_layout's base64 text.
+Each ship is a fixed-width record of (col, row, size, horizontal, name id),
+and names are stored once, in a table. A corpus file holds many layouts of
+the same number of ships, and is read through mmap without copying:
+
+    header   "BSLC", version, ships per layout, name count, layout count
+    names    for each name: its length (uint16), then UTF-8 bytes
+    records  ships per layout * layout count ship records
+"""
+import mmap
+import struct
+
+from battleships import Ship, decode_layout
+
+RECORD = struct.Struct("<HHBBH")  # col, row, size, horizontal, name id
+HEADER = struct.Struct("<4sHHHI")  # magic, version, ships per layout, names, layouts
+NAME_LENGTH = struct.Struct("<H")
+MAGIC = b"BSLC"
+VERSION = 1
+
+class NameTable:
+    """Interned ship names: each distinct name is stored once and
+    referred to by its position in the table."""
+    def __init__(self, names=()):
+        self.names = []
+        self.ids = {}  # name -> id
+        for name in names:
+            self.intern(name)
+
+    def intern(self, name) -> int:
+        name_id = self.ids.get(name)
+        if name_id is None:
+            name_id = self.ids[name] = len(self.names)
+            self.names.append(name)
+        return name_id
+
+    def __getitem__(self, name_id):
+        return self.names[name_id]
+
+    def __len__(self):
+        return len(self.names)
+
+    def to_bytes(self) -> bytes:
+        parts = []
+        for name in self.names:
+            encoded = name.encode("utf-8")
+            parts.append(NAME_LENGTH.pack(len(encoded)) + encoded)
+        return b"".join(parts)
+
+    @classmethod
+    def from_buffer(cls, buffer, offset, count):
+        """Reads count names from the buffer; returns (table, offset after the table)."""
+        table = cls()
+        for _name in range(count):
+            (length,) = NAME_LENGTH.unpack_from(buffer, offset)
+            offset += NAME_LENGTH.size
+            table.intern(bytes(buffer[offset:offset + length]).decode("utf-8"))
+            offset += length
+        return table, offset
+
+def encode_layouts(layouts, names=None) -> bytes:
+    """Packs the ships of every layout into consecutive records, adding
+    their names to the name table (a new one if not given)."""
+    if names is None:
+        names = NameTable()
+    buffer = bytearray()
+    for ships in layouts:
+        for ship in ships:
+            buffer += RECORD.pack(ship.origin_col, ship.origin_row, ship.size,
+                                  ship.horizontal, names.intern(ship.name))
+    return bytes(buffer)
+
+def decode_layouts(buffer, names, ships_per_layout):
+    """Generator of layouts (lists of new ships) from packed records."""
+    ships = []
+    for col, row, size, horizontal, name_id in RECORD.iter_unpack(buffer):
+        ships.append(Ship(col, row, size, bool(horizontal), names[name_id]))
+        if len(ships) == ships_per_layout:
+            yield ships
+            ships = []
+
+def write_corpus(path, layouts):
+    """Writes the layouts (which must all have the same number of ships)
+    to a corpus file; returns the number written."""
+    names = NameTable()
+    records = bytearray()
+    ships_per_layout = None
+    count = 0
+    for ships in layouts:
+        if ships_per_layout is None:
+            ships_per_layout = len(ships)
+        elif len(ships) != ships_per_layout:
+            raise ValueError(f"layout {count} has {len(ships)} ships, "
+                             f"not {ships_per_layout}")
+        records += encode_layouts((ships,), names)
+        count += 1
+
+    with open(path, "wb") as file:
+        file.write(HEADER.pack(MAGIC, VERSION, ships_per_layout or 0, len(names), count))
+        file.write(names.to_bytes())
+        file.write(records)
+    return count
+
+def convert_base64(encoded_layouts, path):
+    """Writes a corpus from encode_layout strings (or bytes), one per layout."""
+    return write_corpus(path, (list(decode_layout(encoded if isinstance(encoded, bytes)
+                                                  else encoded.encode("utf-8")))
+                               for encoded in encoded_layouts))
+
+def mapped_iterator(items, view, own_map):
+    """Yields from items, then releases the view and closes the mapping it
+    reads from (also when the generator is discarded before it finishes)."""
+    try:
+        yield from items
+    finally:
+        del items  # drops the reader's hold on the view
+        view.release()
+        own_map.close()
+
+class LayoutCorpus:
+    """A memory-mapped corpus file, read without copying. record_view() is a
+    view of the corpus's mapping, so it must be released before closing;
+    records() and iteration each map the file themselves and close that
+    mapping when they finish, so the corpus can be closed while they are
+    alive. Layouts are only turned into Ship objects on access.
+
+        with LayoutCorpus("layouts.bslc") as corpus:
+            for ships in corpus: ...
+    """
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = self.view = None
+        try:  # an empty file can't be mapped; a short one has no header
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.view = memoryview(self.map)
+            magic, version, self.ships_per_layout, name_count, self.layout_count = \
+                HEADER.unpack_from(self.view)
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("bad magic or version")
+            self.names, self.records_offset = NameTable.from_buffer(
+                self.view, HEADER.size, name_count)
+        except (ValueError, struct.error) as error:
+            if self.view is not None:
+                self.view.release()
+            if self.map is not None:
+                self.map.close()
+            self.file.close()
+            raise ValueError(f"{path} is not a version {VERSION} layout corpus") from error
+        self.layout_size = self.ships_per_layout * RECORD.size
+
+    def __len__(self):
+        return self.layout_count
+
+    def record_view(self, start=0, stop=None):
+        """A memoryview of the packed records of layouts start to stop.
+        Release it (or use it in a with statement) before closing the corpus."""
+        stop = self.layout_count if stop is None else min(stop, self.layout_count)
+        return self.view[self.records_offset + start * self.layout_size:
+                         self.records_offset + stop * self.layout_size]
+
+    def iterate(self, decode, start=0, stop=None):
+        """Iterates decode(records) over the records of layouts start to stop,
+        read from a new mapping of the file that the iterator owns."""
+        stop = self.layout_count if stop is None else min(stop, self.layout_count)
+        own_map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        own_view = memoryview(own_map)[self.records_offset + start * self.layout_size:
+                                       self.records_offset + stop * self.layout_size]
+        return mapped_iterator(decode(own_view), own_view, own_map)
+
+    def records(self, start=0, stop=None):
+        """Iterates (col, row, size, horizontal, name id) tuples of every ship."""
+        return self.iterate(RECORD.iter_unpack, start, stop)
+
+    def __getitem__(self, number):
+        if not -self.layout_count <= number < self.layout_count:
+            raise IndexError(f"layout {number} out of range")
+        offset = self.records_offset + number % self.layout_count * self.layout_size
+        return next(decode_layouts(self.map[offset:offset + self.layout_size], self.names,
+                                   self.ships_per_layout))
+
+    def __iter__(self):
+        return self.iterate(lambda records: decode_layouts(records, self.names,
+                                                           self.ships_per_layout))
+
+    def close(self):
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError:  # a record_view() is still in use: stay open
+            self.view = memoryview(self.map)
+            raise
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        self.close()
+
+
+if __name__ == "__main__":
+    import os
+    import tempfile
+    from battleships import default_ships, encode_layout, generate_layouts
+
+    def ship_tuples(ships):
+        return [(ship.origin_col, ship.origin_row, ship.size, ship.horizontal, ship.name)
+                for ship in ships]
+
+    # `Test: encode_layouts(layouts) and decode_layouts(...)`
+    test_layouts = list(generate_layouts(default_ships(), count=500))
+    test_names = NameTable()
+    test_data = encode_layouts(test_layouts, test_names)
+    assert len(test_data) == 500 * 5 * RECORD.size and len(test_names) == 5
+    assert [ship_tuples(ships) for ships in decode_layouts(test_data, test_names, 5)] \
+        == [ship_tuples(ships) for ships in test_layouts]
+    print("Test passed: encode_layouts(), decode_layouts()")
+
+    # `Test: LayoutCorpus`, from base64 strings
+    test_path = os.path.join(tempfile.mkdtemp(), "test.bslc")
+    assert convert_base64([encode_layout(ships) for ships in test_layouts], test_path) == 500
+    with LayoutCorpus(test_path) as test_corpus:
+        assert len(test_corpus) == 500
+        assert ship_tuples(test_corpus[-1]) == ship_tuples(test_layouts[-1])
+        assert [ship_tuples(ships) for ships in test_corpus] \
+            == [ship_tuples(ships) for ships in test_layouts]
+        assert sum(1 for _record in test_corpus.records(10, 20)) == 50
+
+        # Iterators own their mapping: discarding one part-way closes it, and
+        # they outlive the corpus. A record view must be released first.
+        test_discarded = iter(test_corpus)
+        next(test_discarded)
+        del test_discarded
+        test_iterators = iter(test_corpus), test_corpus.records()
+        next(test_iterators[0]), next(test_iterators[1])
+        test_view = test_corpus.record_view(0, 1)
+        try:
+            test_corpus.close()
+        except BufferError:
+            pass
+        else:
+            raise AssertionError("closed with a record view in use")
+        assert ship_tuples(test_corpus[0]) == ship_tuples(test_layouts[0])
+        test_view.release()
+    assert [ship_tuples(ships) for ships in test_iterators[0]] \
+        == [ship_tuples(ships) for ships in test_layouts[1:]]
+    assert sum(1 for _record in test_iterators[1]) == 500 * 5 - 1
+
+    # Files without a valid header are closed before the error is raised.
+    for test_content in (b"", b"BSLC", b"NOPE" + bytes(HEADER.size)):
+        with open(test_path, "wb") as test_file:
+            test_file.write(test_content)
+        try:
+            LayoutCorpus(test_path)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"opened {test_content!r} as a corpus")
+    os.remove(test_path)
+    print("Test passed: LayoutCorpus, convert_base64()")
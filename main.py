@@ -1,9 +1,14 @@
 """A graphical solution to Battleships! by Kevin Gao"""
 
 # pygame 1.9.6 (Python 3.8.2)
+from time import perf_counter
+START_TIME = perf_counter()  # for the time to first frame
+
+import argparse
 import pygame as pg
-from scenes import ChooseMode
 from defaults import *
+from profiler import FrameProfiler
+from resources import assets
 
 print('1/3 Starting: pygame initialisation')
 FPS = 60
@@ -11,37 +16,91 @@ clock = pg.time.Clock()
 
 pg.init()
 
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="It's Battleships!")
+    parser.add_argument("--profile", action="store_true",
+                        help="time each phase of every frame and show an overlay")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write per-frame phase timings to a .csv or .json file on exit")
+    parser.add_argument("--startup-benchmark", action="store_true",
+                        help="quit as soon as the first frame is shown")
+    return parser.parse_args()
+
 def main():
+    arguments = parse_arguments()
+    profiler = FrameProfiler(enabled=arguments.profile or arguments.trace is not None,
+                             trace=arguments.trace is not None)
+
     print(f'2/3 Starting: screen resolution {display_width}, {display_height}.')
     screen = pg.display.set_mode((display_width, display_height))
     pg.mixer.pre_init(22050, -16, 2, 512)
 
     print('3/3 Starting: main loop')
+    # Scenes are imported once the window is open, so that it appears sooner.
+    from scenes import ChooseMode
     scene = ChooseMode(screen, clock)
+    scene.profiler = profiler
 
     running = True
+    first_frame = True
 
     while running:
+        profiler.start_frame()
+
         # Handle events --- (pg.key.get_pressed() for pressed keys)
-        if pg.event.get(pg.QUIT):
-            running = False
-        else:
-            scene.handle_events(pg.event.get())
+        with profiler.phase("events"):
+            if pg.event.get(pg.QUIT):
+                running = False
+            else:
+                scene.handle_events(pg.event.get())
 
         # Scene switching ---
         if scene.flag_new_scene is not None:
-            scene = scene.flag_new_scene(screen, clock, *scene.flag_new_scene_args,
-                                         **scene.flag_new_scene_kwargs)
+            with profiler.phase("scene_switch"):
+                scene = scene.flag_new_scene(screen, clock, *scene.flag_new_scene_args,
+                                             **scene.flag_new_scene_kwargs)
+                scene.profiler = profiler
 
         # Update scene and display --
-        scene.update()
-        if clock.get_rawtime() < 1000 / FPS:
-            scene.draw()
+        with profiler.phase("update"):
+            scene.update()
+
+        if dirty_rect_rendering:
+            dirty_rects = []  # nothing to update on frames skipped to catch up
+            if clock.get_rawtime() < 1000 / FPS:
+                with profiler.phase("draw"):
+                    dirty_rects = scene.render()
+                    if arguments.profile:
+                        overlay_rect = profiler.draw_overlay(screen)
+                        dirty_rects.append(overlay_rect)
+                        scene.invalidate(overlay_rect)  # redraw beneath the overlay
+            with profiler.phase("display"):
+                if dirty_rects:
+                    pg.display.update(dirty_rects)
+        else:
+            if clock.get_rawtime() < 1000 / FPS:
+                with profiler.phase("draw"):
+                    scene.draw()
+                    if arguments.profile:
+                        profiler.draw_overlay(screen)
+            with profiler.phase("display"):
+                pg.display.flip()
 
-        pg.display.flip()
+        profiler.end_frame()
+        if first_frame:
+            first_frame = False
+            print(f'Ready: first frame after {(perf_counter() - START_TIME) * 1000:.0f}ms')
+            if arguments.startup_benchmark:
+                running = False
 
         clock.tick(FPS)
 
+    if arguments.trace is not None:
+        profiler.export(arguments.trace)
+        print(f'Frame trace written to {arguments.trace}')
+    if profiler.enabled:
+        print('Asset load times:', ', '.join(assets.report()))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,122 @@
+"""Per-phase frame timing for the main loop: rolling percentiles, an
+on-screen overlay and a per-frame trace (CSV or JSON) for offline analysis."""
+from collections import deque
+from contextlib import contextmanager, nullcontext
+from time import perf_counter
+import csv
+import json
+
+import pygame as pg
+import text
+
+PERCENTILES = (50, 95, 99)
+
+def percentile(sorted_timings, point):
+    """The nearest-rank percentile of an already sorted list."""
+    if not sorted_timings:
+        return 0.0
+    rank = max(0, min(len(sorted_timings) - 1, round(point / 100 * len(sorted_timings)) - 1))
+    return sorted_timings[rank]
+
+class FrameProfiler:
+    """Times each phase of a frame (in ms), keeping the last `window` frames
+    of each phase for rolling percentiles. With trace=True every frame is
+    kept, to be written out with export_csv or export_json. A disabled
+    profiler records nothing, so phases may be timed unconditionally.
+    """
+    def __init__(self, enabled=True, window=600, trace=False):
+        self.enabled = enabled
+        self.window = window
+        self.history = {}  # phase -> deque of recent timings
+        self.frame = {}  # phase -> timing in the current frame
+        self.trace = [] if trace else None
+        self.frame_number = 0
+        self.frame_start = 0.0
+
+        self.summary_interval = 30  # frames between refreshing the overlay summary
+        self._summary = {}
+
+    def start_frame(self):
+        self.frame = {}
+        self.frame_start = perf_counter()
+
+    def end_frame(self):
+        if not self.enabled:
+            return
+        self.frame["frame"] = (perf_counter() - self.frame_start) * 1000
+
+        for phase, timing in self.frame.items():
+            if phase not in self.history:
+                self.history[phase] = deque(maxlen=self.window)
+            self.history[phase].append(timing)
+        if self.trace is not None:
+            self.trace.append(dict(self.frame, frame_number=self.frame_number))
+        self.frame_number += 1
+
+    def phase(self, name):
+        """Context manager which adds the time spent inside it to the phase."""
+        if not self.enabled:
+            return nullcontext()
+        return self._timed(name)
+
+    @contextmanager
+    def _timed(self, name):
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            self.frame[name] = self.frame.get(name, 0.0) + (perf_counter() - start) * 1000
+
+    def summary(self):
+        """Rolling {phase: {"p50": ms, "p95": ms, "p99": ms, "max": ms}}."""
+        summary = {}
+        for phase, timings in self.history.items():
+            ordered = sorted(timings)
+            summary[phase] = {f"p{point}": percentile(ordered, point) for point in PERCENTILES}
+            summary[phase]["max"] = ordered[-1]
+        return summary
+
+    def histogram(self, phase, bucket_ms=1.0):
+        """Counts of the phase's recent timings in buckets of bucket_ms: {bucket start: count}."""
+        counts = {}
+        for timing in self.history.get(phase, ()):
+            bucket = int(timing // bucket_ms) * bucket_ms
+            counts[bucket] = counts.get(bucket, 0) + 1
+        return dict(sorted(counts.items()))
+
+    def draw_overlay(self, surface, position=(4, 4)):
+        """Draws the rolling percentiles of each phase; returns the rect drawn over."""
+        if self.frame_number % self.summary_interval == 0 or not self._summary:
+            self._summary = self.summary()
+
+        lines = ["phase: p50 / p95 / p99 / max (ms)"]
+        for phase, points in self._summary.items():
+            lines.append("{0}: {1[p50]:.2f} / {1[p95]:.2f} / {1[p99]:.2f} / {1[max]:.2f}"
+                         .format(phase, points))
+
+        x, y = position
+        overlay_rect = pg.Rect(x, y, 300, 18 * len(lines))
+        surface.fill(text.BACKGROUND_DEFAULT, overlay_rect)
+        for i, line in enumerate(lines):
+            text.draw(surface, line, (x + text.BOX_PADDING, y + 18*i + 3), dynamic=True)
+        return overlay_rect
+
+    def export_csv(self, path):
+        phases = sorted({phase for frame in self.trace for phase in frame} - {"frame_number"})
+        with open(path, "w", newline="") as file:
+            writer = csv.DictWriter(file, ["frame_number"] + phases, restval="")
+            writer.writeheader()
+            writer.writerows(self.trace)
+
+    def export_json(self, path):
+        with open(path, "w") as file:
+            json.dump({"summary": self.summary(), "frames": self.trace}, file)
+
+    def export(self, path):
+        """Writes the trace as JSON if the path ends in .json, otherwise as CSV."""
+        if path.endswith(".json"):
+            self.export_json(path)
+        else:
+            self.export_csv(path)
+
+disabled_profiler = FrameProfiler(enabled=False)
@@ -1,5 +1,15 @@
 import pygame as pg
 import os.path
+import threading
+from time import perf_counter
+
+AUDIO_PATHS = {
+    "begin": os.path.join("Assets", "ht-ostinato.ogg"),
+    "alert": os.path.join("Assets", "ht-interact.ogg"),
+    "cue": os.path.join("Assets", "sfx-lowblip.wav"),
+    "hit": os.path.join("Assets", "sfx-bitnoise.ogg"),
+    "sink": os.path.join("Assets", "sfx-bitflare.ogg")
+}
 
 class TileSpriteSheet:
     def __init__(self, filename):
@@ -31,32 +41,124 @@ def load_ship_images():
             ship_sprite_sheet.load_image((5, row, size, 1), 16))  # blueprint-style image
     return ship_images
 
-def get_ship_image(ship, ship_images, grid_x, grid_y, spacing: int, palette=0):
+def scale_ship_image(ship_images, name, size: int, spacing: int, horizontal: bool,
+                     palette=0):
+    """Returns a new surface: the ship's image scaled to the tile spacing and rotated."""
     try:
-        image = ship_images[ship.name][palette]
-        image = pg.transform.scale(image, (spacing * ship.size, spacing))
+        image = ship_images[name][palette]
+        image = pg.transform.scale(image, (spacing * size, spacing))
     except KeyError:
-        image = pg.Surface((spacing * ship.size, spacing))
+        image = pg.Surface((spacing * size, spacing))
+
+    return pg.transform.rotate(image, 0 if horizontal else 90)
 
-    image = pg.transform.rotate(image, 0 if ship.horizontal else 90)
+def get_ship_image(ship, ship_images, grid_x, grid_y, spacing: int, palette=0):
+    image = scale_ship_image(ship_images, ship.name, ship.size, spacing, ship.horizontal,
+                             palette)
     x = grid_x + spacing * ship.origin_col
     y = grid_y + spacing * ship.origin_row
     return image, x, y
 
+class ShipSprites:
+    """A cache of pre-scaled and pre-rotated ship images, filled from the
+    ship_images dictionary. The surfaces are shared, so only blit them:
+    pass alpha to get a separate, translucent copy.
+    """
+    def __init__(self, ship_images):
+        self.ship_images = ship_images
+        self.cache = {}
+
+    def get(self, name, size: int, spacing: int, horizontal: bool, palette=0, alpha=None):
+        key = (name, size, palette, spacing, horizontal, alpha)
+        image = self.cache.get(key)
+
+        if image is None:
+            image = scale_ship_image(self.ship_images, name, size, spacing, horizontal,
+                                     palette)
+            if alpha is not None:
+                image.set_alpha(alpha)
+            self.cache[key] = image
+        return image
+
+    def get_ship_image(self, ship, grid_x, grid_y, spacing: int, palette=0, alpha=None):
+        """Like get_ship_image, but a cache lookup after the first call."""
+        image = self.get(ship.name, ship.size, spacing, ship.horizontal, palette, alpha)
+        x = grid_x + spacing * ship.origin_col
+        y = grid_y + spacing * ship.origin_row
+        return image, x, y
+
 def load_audio(keys=None):
     """Generates the audio dictionary."""
-    paths = {
-        "begin": os.path.join("Assets", "ht-ostinato.ogg"),
-        "alert": os.path.join("Assets", "ht-interact.ogg"),
-        "cue": os.path.join("Assets", "sfx-lowblip.wav"),
-        "hit": os.path.join("Assets", "sfx-bitnoise.ogg"),
-        "sink": os.path.join("Assets", "sfx-bitflare.ogg")
-    }
     if keys is None:
-        keys = paths.keys()
+        keys = AUDIO_PATHS.keys()
     sounds = {}
 
     for key in keys:
-        sounds[key] = pg.mixer.Sound(paths[key])
+        sounds[key] = pg.mixer.Sound(AUDIO_PATHS[key])
 
     return sounds
+
+class AssetManager:
+    """Loads each asset at most once, shared by every scene. Assets can
+    be preloaded on a background thread, i.e. while the menu is shown;
+    a scene which needs an asset that is still loading waits for it.
+    """
+    def __init__(self):
+        self.assets = {}  # key -> loaded asset
+        self.load_times = {}  # key -> seconds taken to load
+        self.lock = threading.Lock()
+        self.key_locks = {}  # key -> lock held while the asset loads
+        self.preload_error = None  # the error which stopped preloading, if any
+
+    def get(self, key, loader):
+        """Returns the asset, calling loader() if it has not been loaded."""
+        asset = self.assets.get(key)
+        if asset is not None:
+            return asset
+
+        with self.lock:
+            key_lock = self.key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self.assets:
+                start = perf_counter()
+                self.assets[key] = loader()
+                self.load_times[key] = perf_counter() - start
+        return self.assets[key]
+
+    def ship_sprites(self):
+        """The shared ship sprite cache, built from the ship images."""
+        return self.get("ship_sprites", lambda: ShipSprites(load_ship_images()))
+
+    def sound(self, key):
+        return self.get("audio:" + key, lambda: pg.mixer.Sound(AUDIO_PATHS[key]))
+
+    def audio(self, keys=None):
+        """Like load_audio, but each sound is only loaded once."""
+        if keys is None:
+            keys = AUDIO_PATHS.keys()
+        return {key: self.sound(key) for key in keys}
+
+    def preload(self, ship_sprites=True, audio_keys=None):
+        """Loads assets on a background thread; returns the (daemon) thread."""
+        def load():
+            try:
+                if ship_sprites:
+                    self.ship_sprites()
+                self.audio(audio_keys)
+            except pg.error as e:  # leave it to the scene that needs it to fail
+                self.preload_error = e
+
+        thread = threading.Thread(target=load, name="preload assets", daemon=True)
+        thread.start()
+        return thread
+
+    def report(self):
+        """Load times of every asset loaded so far, slowest first
+        (and why preloading failed, if it did)."""
+        lines = [f"{key}: {seconds * 1000:.1f}ms" for key, seconds in
+                 sorted(self.load_times.items(), key=lambda item: -item[1])]
+        if self.preload_error is not None:
+            lines.append(f"preloading failed: {self.preload_error}")
+        return lines
+
+assets = AssetManager()
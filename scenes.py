@@ -5,10 +5,12 @@ import text
 from base_scene import Scene
 from defaults import *
 from battleships import default_ships, generate_blank_grid, check_ship_position, \
-    generate_computer_layout, encode_layout, decode_layout, place_ship, remove_ship
-from components import TrackingBoard, layout_grid, snap_to_grid
-from resources import load_ship_images, get_ship_image, load_audio
-from computer_player import OpportunityPlayer
+    generate_computer_layout, encode_layout, decode_layout, place_ship, remove_ship, BitBoard, \
+    SparseBoard, fleet
+from components import TrackingBoard, BoardViewport, layout_grid, snap_to_grid
+from resources import assets
+from computer_player import OpportunityPlayer, SparsePlayer
+from game_log import open_game_log
 
 ModeSingle, ModeComputer, ModeTwoPlayer = range(3)
 
@@ -23,15 +25,20 @@ class ChooseMode(Scene):
                              color=C_DARK, background=C_LIGHT)
         play_mode_2 = Button((180, 135, 280, 33), "Single Board", self.mode_single,
                              color=C_LIGHT, background=C_BLUEPRINT_BLUE)
+        play_mode_3 = Button((180, 175, 280, 33), "Large Board Simulation", self.mode_large,
+                             color=C_LIGHT, background=C_DARK_ISH)
         quit_button = Button((180, 250, 280, 28), "Quit", cause_quit_event, color=C_RED)
 
-        for button in play_mode_0, play_mode_1, play_mode_2, quit_button:
+        for button in play_mode_0, play_mode_1, play_mode_2, play_mode_3, quit_button:
             self.add_mouse_handler(button)  # buttons register draw, update, mouse events
 
+        # Load the assets for Setup and Game while the menu is displayed.
+        assets.preload()
+
     def draw(self):
         super().draw()
         text.draw(self.screen, "Battleships! - (git build)", (180, 30),
-                  color=C_DARK_ISH)
+                  color=C_DARK_ISH, static=True)
 
     def mode_single(self):
         self.change_scene(Setup, ModeSingle)
@@ -42,25 +49,30 @@ class ChooseMode(Scene):
     def mode_two_player(self):
         self.change_scene(Setup, ModeTwoPlayer)
 
+    def mode_large(self):
+        self.change_scene(LargeBoard)
+
 class Setup(Scene):
     def __init__(self, screen, clock, mode, player_ships=None, player_arrangement=None, mute=False):
         super().__init__(screen, clock)
         pg.display.set_caption("Battleships! > Designer")
 
-        self.ship_images = load_ship_images()
-        self.audio = load_audio(("cue", "alert"))
+        self.ship_sprites = assets.ship_sprites()
+        self.audio = assets.audio(("cue", "alert"))
         self.sound_toggle(mute)  # set sound to muted based on previous setting
 
         self.mode = mode
         if player_ships is None:
             # New game - use blank board arrangement.
             self.p_stock_ships = (default_ships(), default_ships())
-            self.p_arrangement = (generate_blank_grid(None), generate_blank_grid(None))
+            self.p_arrangement = (generate_blank_grid(None, board_width, board_height),
+                                  generate_blank_grid(None, board_width, board_height))
             self.p_ships = ([], [])
         elif mode == ModeComputer:
             # Rematch game - keep player's placements, re-randomise computer's.
             self.p_stock_ships = ([], default_ships())
-            self.p_arrangement = (player_arrangement[0], generate_blank_grid(None))
+            self.p_arrangement = (player_arrangement[0],
+                                  generate_blank_grid(None, board_width, board_height))
             self.p_ships = (player_ships[0], [])
         else:
             # Rematch game - keep previous ship placements.
@@ -78,7 +90,8 @@ class Setup(Scene):
             color=C_DARK_BLUE, background=C_LIGHT)
         self.pick_ship_trigger = Button(
             (0, 0, 88, display_height), "", self.pick_ship, background=C_BLUEPRINT_BLUE)
-        self.touch_grid_trigger = Button((130, 50, 316, 316), "", self.touch_grid)
+        self.touch_grid_trigger = Button((130, 50, 32*board_width - 4, 32*board_height - 4), "",
+                                         self.touch_grid)
         self.touch_grid_trigger.visible = False
 
         for button in self.start_button, self.pick_ship_trigger, self.touch_grid_trigger:
@@ -108,6 +121,11 @@ class Setup(Scene):
         super().handle_events(pygame_events)
 
         for event in pygame_events:
+            # Clicks and keys may change the layout, and the held ship follows the mouse.
+            if event.type in (pg.MOUSEBUTTONDOWN, pg.MOUSEBUTTONUP, pg.KEYDOWN) \
+                    or event.type == pg.MOUSEMOTION and self.held_ship is not None:
+                self.invalidate()
+
             if event.type == pg.MOUSEMOTION:
                 self.mouse_x, self.mouse_y = event.pos
             elif event.type == pg.KEYDOWN:
@@ -132,13 +150,13 @@ class Setup(Scene):
         for actor in self.actors:
             actor.draw(self.screen)
 
-        # Draw 10*10 grid for alignment.
-        for x, y, col, row in layout_grid(130, 50, 32):
+        # Draw the grid for alignment.
+        for x, y, col, row in layout_grid(130, 50, 32, board_width, board_height):
             pg.draw.rect(self.screen, C_HIGHLIGHT_BLUE, (x, y, 28, 28))
 
         # Draw the placed ships.
         for ship in self.p_ships[self.turn]:
-            image, x, y = get_ship_image(ship, self.ship_images, 130, 50, 32, 1)
+            image, x, y = self.ship_sprites.get_ship_image(ship, 130, 50, 32, 1)
             self.screen.blit(image, (x - 2, y - 2))  # subtract 2 to centre on tiles
 
         # Draw the outline of the held ship.
@@ -146,35 +164,34 @@ class Setup(Scene):
             col, row = snap_to_grid(self.mouse_x, self.mouse_y, 130, 50, 32)
             self.held_ship.origin_col, self.held_ship.origin_row = col, row
 
-            image, x, y = get_ship_image(self.held_ship, self.ship_images, 130, 50, 32, 1)
-            if check_ship_position(self.held_ship, self.p_arrangement[self.turn]) == 0:
-                image.set_alpha(255)
+            if check_ship_position(self.held_ship, self.p_arrangement[self.turn],
+                                   board_width, board_height) == 0:
+                image, x, y = self.ship_sprites.get_ship_image(
+                    self.held_ship, 130, 50, 32, 1, alpha=255)
                 self.screen.blit(image, (x - 2, y - 2))  # subtract 2 to centre on tiles
             else:
-                image.set_alpha(159)
+                image, x, y = self.ship_sprites.get_ship_image(
+                    self.held_ship, 130, 50, 32, 1, alpha=159)
                 self.screen.blit(image, (self.mouse_x - 16, self.mouse_y - 16))
 
         # Draw the next ship to place.
         for i, ship in enumerate(self.p_stock_ships[self.turn]):
-            image = self.ship_images[ship.name][1]
-            if i == len(self.p_stock_ships[self.turn]) - 1:
-                image.set_alpha(255)
-            else:
-                image.set_alpha(96)
+            alpha = 255 if i == len(self.p_stock_ships[self.turn]) - 1 else 96
+            image = self.ship_sprites.get(ship.name, ship.size, 16, True, 1, alpha)
             self.screen.blit(image, (8, display_height/3 + i*24))
 
         _message = "Player {0}'s Board: {1} ship{2} remaining".format(
             self.turn + 1, len(self.p_stock_ships[self.turn]),
             "s" if len(self.p_stock_ships[self.turn]) != 1 else ""
         )
-        text.draw(self.screen, _message, (130, 30), color=C_LIGHT)
+        text.draw(self.screen, _message, (130, 30), color=C_LIGHT, dynamic=True)
 
         if len(self.p_stock_ships[self.turn]) > 0:
             text.draw(self.screen, "Pick up a new ship by clicking over the left edge.",
-                      (130, 390), color=C_LIGHT)
+                      (130, 390), color=C_LIGHT, static=True)
         if self.held_ship is not None or len(self.p_ships[self.turn]) > 0:
             text.draw(self.screen, "Click to pick up or place. R to rotate.",
-                      (130, 410), color=C_LIGHT)
+                      (130, 410), color=C_LIGHT, static=True)
 
     def change_scene_menu(self):
         self.change_scene(ChooseMode)
@@ -193,7 +210,7 @@ class Setup(Scene):
             if self.mode == ModeComputer:
                 # Randomly generate a layout for player 2 (who is index 1).
                 generate_computer_layout(self.p_ships[1], self.p_arrangement[1],
-                                         self.p_stock_ships[1])
+                                         self.p_stock_ships[1], board_width, board_height)
             self.change_scene(Game, self.mode, self.p_ships, self.p_arrangement, self.mute)
 
     def pick_ship(self):
@@ -223,7 +240,8 @@ class Setup(Scene):
         else:
             # Check if the chosen ship position is valid.
             self.held_ship.origin_col, self.held_ship.origin_row = col, row
-            issue = check_ship_position(self.held_ship, self.p_arrangement[self.turn])
+            issue = check_ship_position(self.held_ship, self.p_arrangement[self.turn],
+                                        board_width, board_height)
 
             if issue == 0:
                 place_ship(self.held_ship, self.p_ships[self.turn],
@@ -262,31 +280,42 @@ class Setup(Scene):
                 sound.set_volume(100)
 
 class Game(Scene):
-    strike_font = pg.font.SysFont('Calibri', 20)
+    @property
+    def strike_font(self):
+        return text.get_font(20)
 
     def __init__(self, screen, clock, mode, player_ships, player_arrangement, mute=False):
         super().__init__(screen, clock)
         pg.display.set_caption("The Ocean")
 
-        self.ship_images = load_ship_images()
-        self.audio = load_audio()
+        self.ship_sprites = assets.ship_sprites()
+        self.audio = assets.audio()
         self.sound_toggle(mute)  # set sound to muted based on previous setting
         self.audio["begin"].play()
 
         self.mode = mode
         self.p_ships = player_ships
         self.p_arrangement = player_arrangement
-        # Indicates which of your tiles have been revealed by the other player.
-        self.p_revealed = (generate_blank_grid(False), generate_blank_grid(False))
+        # Bitmask boards track your ships and which of your tiles
+        # have been revealed by the other player.
+        self.p_boards = (BitBoard.from_ships(player_ships[0], board_width, board_height),
+                         BitBoard.from_ships(player_ships[1], board_width, board_height))
 
         self.turn = 0  # 0 for player 1, 1 for player 2
         self.winner = None  # None for undecided, 0 for player 1, 1 for player 2
 
+        self.log = open_game_log(game_log_directory, board_width, board_height, mode)
+        if self.log is not None:
+            for player in 0, 1:
+                self.log.layout(player, self.p_ships[player])
+
         if mode == ModeTwoPlayer:
-            # Create 10*10 "tracking" grids for each player
+            # Create "tracking" grids for each player
             # to select opponent tiles to reveal.
-            tracking_board_0 = TrackingBoard(30, 50, self.reveal, self.p_arrangement[1])
-            tracking_board_1 = TrackingBoard(30, 50, self.reveal, self.p_arrangement[0])
+            tracking_board_0 = TrackingBoard(30, 50, self.reveal, self.p_arrangement[1],
+                                             board_width, board_height)
+            tracking_board_1 = TrackingBoard(30, 50, self.reveal, self.p_arrangement[0],
+                                             board_width, board_height)
             tracking_board_1.enabled = False
 
             self.add_mouse_handler(tracking_board_0)
@@ -300,71 +329,96 @@ class Game(Scene):
             self.switch_turn_button.enabled = False
             self.add_mouse_handler(self.switch_turn_button)
         else:
-            # Create 10*10 "tracking" grid for the player to select tiles to reveal.
+            # Create a "tracking" grid for the player to select tiles to reveal.
             target = 0 if mode == ModeSingle else 1
-            tracking_board_0 = TrackingBoard(30, 50, self.reveal,
-                                             self.p_arrangement[target])
+            tracking_board_0 = TrackingBoard(30, 50, self.reveal, self.p_arrangement[target],
+                                             board_width, board_height)
             self.add_mouse_handler(tracking_board_0)
             self.tracking_boards = (tracking_board_0, None)
 
         self.add_mouse_handler(Button((492, 5, 120, 28), "Back to Designer",
                                self.reset_game, color=C_DARK, background=C_LIGHT))
 
+        self.timer_message = ""
+        # Rendered primary boards, keyed by (player, hide_ships): see primary_board_surface.
+        self.board_surfaces = {}
+
         if mode == ModeComputer:
             self.hide_ships = False
             # self.computer = ComputerPlayer(self.p_arrangement[0], self.p_revealed[0])
-            self.computer = OpportunityPlayer(self.p_ships[0], self.p_arrangement[0], self.p_revealed[0])
+            self.computer = OpportunityPlayer(self.p_ships[0], self.p_boards[0], self.p_boards[0],
+                                              board_width, board_height)
         else:
             self.hide_ships = True
 
+    def update(self):
+        super().update()
+
+        timer_message = f"{self.clock.get_rawtime()}ms / frame"
+        if timer_message != self.timer_message:
+            self.timer_message = timer_message
+            self.invalidate((20, display_height - 20, 120, 20))
+
     def draw(self):
         self.screen.fill(C_LIGHT)
         for actor in self.actors:
             actor.draw(self.screen)
 
-        # Draw the player's own 10*10 primary board.
-        for x, y, col, row in layout_grid(375, 50, 24):
-            # Colour and text is determined for each tile;
-            # This depends on if it has been revealed and/or hides a ship.
-            tile_is_part_of_ship = self.p_arrangement[self.turn][row][col] is not None
-
-            if tile_is_part_of_ship and not self.hide_ships:
-                if self.p_revealed[self.turn][row][col]:
-                    ship_is_destroyed = self.p_arrangement[self.turn][row][col] \
-                                            .destroyed(self.p_revealed[self.turn])
-                    color = C_RED if ship_is_destroyed else C_YELLOW
-                else:
-                    color = C_LIGHT_GREEN
-            else:
-                color = C_DARK_BLUE if self.p_revealed[self.turn][row][col] else C_LIGHT_ISH
-
-            pg.draw.rect(self.screen, color, (x, y, 21, 21))
+        # Draw the player's own primary board.
+        self.screen.blit(self.primary_board_surface(), (375, 50))
 
         if not self.hide_ships or self.winner is not None:
             # Draw the ships.
             for ship in self.p_ships[self.turn]:
-                image, x, y = get_ship_image(ship, self.ship_images, 375, 50, 24)
-                image.set_alpha(249)
+                image, x, y = self.ship_sprites.get_ship_image(ship, 375, 50, 24, alpha=249)
                 self.screen.blit(image, (x - 2, y - 2))  # subtract 2 to centre on tiles
         elif self.mode == ModeTwoPlayer:
             hint_message = "The other player should click here:"
-            text.draw(self.screen, hint_message, (375, 347), color=C_DARK_ISH)
+            text.draw(self.screen, hint_message, (375, 347), color=C_DARK_ISH, static=True)
 
         # Reveal any opponent ships that have been sunk too.
         for ship in self.p_ships[self.opponent()]:
-            if ship.destroyed(self.p_revealed[self.opponent()]) or self.winner is not None:
-                image, x, y = get_ship_image(ship, self.ship_images, 30, 50, 32)
-                image.set_alpha(209)
+            if self.p_boards[self.opponent()].destroyed(ship) or self.winner is not None:
+                image, x, y = self.ship_sprites.get_ship_image(ship, 30, 50, 32, alpha=209)
                 self.screen.blit(image, (x - 2, y - 2))  # subtract 2 to centre on tiles
 
-        text.draw(self.screen, f"Player {self.turn + 1}'s turn", (30, 10), color=C_DARK)
+        text.draw(self.screen, f"Player {self.turn + 1}'s turn", (30, 10), color=C_DARK,
+                  static=True)
         text.draw(self.screen, "Opponent's Grid", (30, 370),
                   color=C_DARK_ISH, static=True)
         text.draw(self.screen, "Your Grid", (375, 290),
                   color=C_DARK_ISH, static=True)
 
-        timer_message = f"{self.clock.get_rawtime()}ms / frame"
-        text.draw(self.screen, timer_message, (20, display_height - 20))
+        text.draw(self.screen, self.timer_message, (20, display_height - 20), dynamic=True)
+
+    def primary_board_surface(self):
+        """The current player's primary board, rendered once and cached
+        until a reveal or turn change (see board_surfaces)."""
+        key = (self.turn, self.hide_ships)
+        surface = self.board_surfaces.get(key)
+        if surface is not None:
+            return surface
+
+        surface = pg.Surface((24*board_width - 3, 24*board_height - 3))
+        surface.fill(C_LIGHT)
+        board = self.p_boards[self.turn]
+        for x, y, col, row in layout_grid(0, 0, 24, board_width, board_height):
+            # Colour and text is determined for each tile;
+            # This depends on if it has been revealed and/or hides a ship.
+            parent_ship = board.ship_at(col, row)
+
+            if parent_ship is not None and not self.hide_ships:
+                if board.is_revealed(col, row):
+                    color = C_RED if board.destroyed(parent_ship) else C_YELLOW
+                else:
+                    color = C_LIGHT_GREEN
+            else:
+                color = C_DARK_BLUE if board.is_revealed(col, row) else C_LIGHT_ISH
+
+            pg.draw.rect(surface, color, (x, y, 21, 21))
+
+        self.board_surfaces[key] = surface
+        return surface
 
     def opponent(self):
         if self.mode == ModeSingle:
@@ -373,16 +427,19 @@ class Game(Scene):
             return not self.turn
 
     def reveal(self, col, row):
-        self.p_revealed[self.opponent()][row][col] = True
-        parent_ship = self.p_arrangement[self.opponent()][row][col]
+        self.invalidate()
+        self.board_surfaces.clear()
+        board = self.p_boards[self.opponent()]
+        parent_ship = board.reveal(col, row)
+        if self.log is not None:
+            self.log.reveal(int(self.opponent()), col, row)
 
         if parent_ship is not None:
-            if parent_ship.destroyed(self.p_revealed[self.opponent()]):
+            if board.destroyed(parent_ship):
                 print(f"Hit: ship sunk!")
                 for col, row in parent_ship.tile_indexes():
-                    index = col*board_width + row
-                    tile = self.tracking_boards[self.turn].tiles[index]
-                    tile.style["background_disabled"] = C_RED
+                    tile = self.tracking_boards[self.turn].tile_at(col, row)
+                    tile.set_style(background_disabled=C_RED)
 
                 self.audio["sink"].play()
                 self.game_win_check()
@@ -394,8 +451,7 @@ class Game(Scene):
             self.audio["cue"].play()
 
     def game_win_check(self):
-        if all(ship.destroyed(self.p_revealed[self.opponent()])
-               for ship in self.p_ships[self.opponent()]) and self.winner is None:
+        if self.p_boards[self.opponent()].all_destroyed() and self.winner is None:
             print("All ships destroyed.")
             self.add_mouse_handler(Button((375, 370, 120, 28), "Finish", self.reset_game,
                                           color=C_LIGHT, background=C_BLUEPRINT_BLUE))
@@ -408,6 +464,8 @@ class Game(Scene):
                 self.tracking_boards[0].disable_input = True
 
     def end_turn(self):
+        self.invalidate()
+        self.board_surfaces.clear()
         if self.mode == ModeTwoPlayer:
             # Blank the current player's board so the other player can't peek.
             self.hide_ships = True
@@ -417,14 +475,16 @@ class Game(Scene):
             self.tracking_boards[self.turn].disable_input = True
 
         elif self.mode == ModeComputer:
-            col, row = self.computer.play_move()
+            with self.profile("computer_move"):
+                col, row = self.computer.play_move()
             if col is None or row is None:
                 return
 
-            self.p_revealed[0][row][col] = True
-            parent_ship = self.p_arrangement[0][row][col]
+            parent_ship = self.p_boards[0].reveal(col, row)
+            if self.log is not None:
+                self.log.reveal(0, col, row)
 
-            if parent_ship is not None and parent_ship.destroyed(self.p_revealed[0]):
+            if parent_ship is not None and self.p_boards[0].destroyed(parent_ship):
                 self.turn = int(not self.turn)
                 self.game_win_check()
                 self.turn = int(not self.turn)
@@ -434,6 +494,8 @@ class Game(Scene):
             return
 
     def switch_turn(self):
+        self.invalidate()
+        self.board_surfaces.clear()
         self.turn = int(not self.turn)
         # Enable the current player's boards.
         self.tracking_boards[self.turn].enabled = True
@@ -452,8 +514,94 @@ class Game(Scene):
                 sound.set_volume(100)
 
     def reset_game(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
         self.change_scene(Setup, self.mode, self.p_ships, self.p_arrangement, self.mute)
 
+class LargeBoard(Scene):
+    """Watch the computer clear a large board, stored sparsely (see SparseBoard),
+    through a scrollable viewport which only draws the tiles in view."""
+    def __init__(self, screen, clock):
+        super().__init__(screen, clock)
+        pg.display.set_caption("Battleships! > Large Board")
+
+        self.board = SparseBoard(large_board_width, large_board_height)
+        self.ships = []
+        generate_computer_layout(self.ships, self.board, fleet(large_board_fleets))
+        self.computer = SparsePlayer(self.ships, self.board, self.board,
+                                     large_board_width, large_board_height)
+        self.shots = 0
+        self.paused = False
+        self.status_message = ""
+
+        self.viewport = BoardViewport((20, 50, 460, 400), self.board)
+        self.add_mouse_handler(self.viewport)
+
+        align_right = display_width - 140
+        pause_button = Toggle((align_right, 50, 120, 28), "Pause", self.pause_toggle,
+                              color=C_DARK_BLUE, background=C_LIGHT)
+        back_button = Button((align_right, 100, 120, 28), "Back to Menu", self.change_scene_menu,
+                             color=C_RED, background=C_LIGHT)
+        for button in pause_button, back_button:
+            self.add_mouse_handler(button)
+
+    def handle_events(self, pygame_events):
+        super().handle_events(pygame_events)
+
+        for event in pygame_events:
+            if event.type == pg.KEYDOWN:
+                step = 10 if event.mod & pg.KMOD_SHIFT else 1
+                if event.key == pg.K_LEFT:
+                    self.viewport.scroll(-step, 0)
+                elif event.key == pg.K_RIGHT:
+                    self.viewport.scroll(step, 0)
+                elif event.key == pg.K_UP:
+                    self.viewport.scroll(0, -step)
+                elif event.key == pg.K_DOWN:
+                    self.viewport.scroll(0, step)
+
+    def update(self):
+        super().update()
+
+        if not self.paused and not self.board.all_destroyed():
+            with self.profile("computer_move"):
+                for _shot in range(large_board_shots_per_frame):
+                    col, row = self.computer.play_move()
+                    if col is None or row is None:
+                        break
+                    self.shots += 1
+                    parent_ship = self.board.reveal(col, row)
+                    self.viewport.tile_changed(col, row)
+
+                    if parent_ship is not None and self.board.destroyed(parent_ship):
+                        for tile_col, tile_row in parent_ship.tile_indexes():
+                            self.viewport.tile_changed(tile_col, tile_row)
+                        if self.board.all_destroyed():
+                            break
+
+        status_message = "{0} x {1}: {2} shots, {3} of {4} ships afloat".format(
+            self.board.width, self.board.height, self.shots, self.board.ships_afloat,
+            len(self.ships))
+        if status_message != self.status_message:
+            self.status_message = status_message
+            self.invalidate((20, 20, 460, 24))
+
+    def draw(self):
+        self.screen.fill(C_LIGHT)
+        for actor in self.actors:
+            actor.draw(self.screen)
+
+        text.draw(self.screen, self.status_message, (20, 24), color=C_DARK, dynamic=True)
+        text.draw(self.screen, "Arrow keys (with shift for faster) or drag to scroll.",
+                  (20, 455), color=C_DARK_ISH, static=True)
+
+    def pause_toggle(self, checked):
+        self.paused = checked
+
+    def change_scene_menu(self):
+        self.change_scene(ChooseMode)
+
 def cause_quit_event():
     """Push a QUIT event onto the event queue, which is registered by the main loop."""
     pg.event.post(pg.event.Event(pg.QUIT, {}))
@@ -0,0 +1,278 @@
+"""An asyncio server hosting many two-player matches in one process, with
+a load-test client. Messages are JSON objects, one per line, over TCP:
+
+    client -> server  {"type": "join", "layout": encode_layout string (optional)}
+                      {"type": "fire", "col": 3, "row": 4}
+    server -> client  {"type": "start", "player": 0, "width": 10, "height": 10, "turn": 0}
+                      {"type": "shot", "player": 0, "col": 3, "row": 4, "hit": true,
+                       "sunk": null, "turn": 0, "winner": null}
+                      {"type": "error", "message": "..."}
+                      {"type": "opponent_left"}
+
+Players are paired in the order they join; the turn rules are simulation.Match.
+A client which falls behind reading, so that more than MAX_WRITE_BUFFER bytes
+are waiting to be sent to it, is disconnected.
+
+    python server.py --port 8765
+    python server.py --load-test --matches 2000
+"""
+import asyncio
+import json
+import random
+from time import perf_counter
+
+from battleships import default_ships, decode_layout, encode_layout, generate_layouts, \
+    BitBoard, Valid
+from defaults import board_width, board_height
+from simulation import Match
+
+MAX_WRITE_BUFFER = 2**16  # bytes
+
+def parse_layout(encoded, width=board_width, height=board_height):
+    """The ships of an encode_layout string, checked to be a legal layout of
+    the default ships. Raises ValueError if not."""
+    if not isinstance(encoded, str):
+        raise ValueError("the layout must be an encode_layout string")
+    ships = list(decode_layout(encoded.encode("utf-8")))
+    if sorted(ship.size for ship in ships) != sorted(ship.size for ship in default_ships()):
+        raise ValueError("the layout must have one of each of the default ships")
+
+    board = BitBoard(width, height)
+    for ship in ships:
+        if board.check_ship_position(ship) != Valid:
+            raise ValueError(f"{ship.name or 'a ship'} is out of bounds or overlapping")
+        board.place_ship(ship)
+    return ships
+
+class Connection:
+    """A connected player, and the match they are in (once paired)."""
+    def __init__(self, writer):
+        self.writer = writer
+        self.ships = None
+        self.room = None
+        self.player = None  # 0 or 1 within the room
+
+    def send(self, message):
+        """Writes the message without waiting for it to be sent: this may be
+        the opponent's connection. If the client has fallen behind, it is
+        dropped instead of letting the buffer grow."""
+        if self.writer.is_closing():
+            return
+        self.writer.write(json.dumps(message).encode("utf-8") + b"\n")
+        if self.writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER:
+            self.writer.transport.abort()
+
+class Room:
+    """A match between two connections."""
+    def __init__(self, connections, width, height):
+        self.connections = connections
+        self.match = Match((connections[0].ships, connections[1].ships), width, height)
+        for player, connection in enumerate(connections):
+            connection.room = self
+            connection.player = player
+
+    def broadcast(self, message):
+        for connection in self.connections:
+            if connection is not None:
+                connection.send(message)
+
+class MatchServer:
+    """Pairs connections into matches and relays their shots. Every match
+    is validated by its own simulation.Match."""
+    def __init__(self, width=board_width, height=board_height):
+        self.width = width
+        self.height = height
+        self.waiting = None  # a connection waiting for an opponent
+        self.matches = 0  # matches started
+        self.moves = 0
+
+    async def start(self, host="127.0.0.1", port=8765):
+        return await asyncio.start_server(self.handle, host, port, limit=2**16)
+
+    async def handle(self, reader, writer):
+        connection = Connection(writer)
+        try:
+            while True:
+                try:
+                    line = await reader.readline()
+                except ValueError:  # longer than the limit: the rest can't be parsed
+                    connection.send({"type": "error", "message": "message too long"})
+                    break
+                if not line:
+                    break
+                try:
+                    message = json.loads(line)
+                    if not isinstance(message, dict):
+                        raise ValueError("messages must be JSON objects")
+                    if message.get("type") == "join":
+                        self.join(connection, message)
+                    elif message.get("type") == "fire":
+                        self.fire(connection, message)
+                    else:
+                        raise ValueError(f"unknown message type {message.get('type')!r}")
+                except (ValueError, TypeError, KeyError) as error:
+                    connection.send({"type": "error", "message": str(error)})
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.leave(connection)
+            writer.close()
+
+    def join(self, connection, message):
+        if connection.ships is not None:
+            raise ValueError("already joined")
+        if message.get("layout"):
+            connection.ships = parse_layout(message["layout"], self.width, self.height)
+        else:
+            connection.ships = next(generate_layouts(default_ships(), self.width, self.height))
+
+        if self.waiting is None:
+            self.waiting = connection
+            return
+        room = Room([self.waiting, connection], self.width, self.height)
+        self.waiting = None
+        self.matches += 1
+        for player, player_connection in enumerate(room.connections):
+            player_connection.send({"type": "start", "player": player, "width": self.width,
+                                    "height": self.height, "turn": room.match.turn})
+
+    def fire(self, connection, message):
+        room = connection.room
+        if room is None:
+            raise ValueError("not in a match")
+        match = room.match
+        if match.winner is None and match.turn != connection.player:
+            raise ValueError("it is not your turn")
+
+        col, row = message["col"], message["row"]
+        if type(col) is not int or type(row) is not int:  # not bool either
+            raise ValueError("col and row must be integers")
+        parent_ship = match.reveal(col, row)  # raises ValueError for an illegal shot
+        self.moves += 1
+        target = match.p_boards[int(not connection.player)]
+        sunk = parent_ship is not None and target.destroyed(parent_ship)
+        room.broadcast({"type": "shot", "player": connection.player, "col": col, "row": row,
+                        "hit": parent_ship is not None,
+                        "sunk": parent_ship.name if sunk else None,
+                        "turn": match.turn, "winner": match.winner})
+
+    def leave(self, connection):
+        if self.waiting is connection:
+            self.waiting = None
+        room = connection.room
+        if room is not None:
+            room.connections[connection.player] = None
+            if room.match.winner is None:
+                room.broadcast({"type": "opponent_left"})
+
+async def simulated_player(host, port, latencies, rng):
+    """A load-test client: joins with a random layout, then fires at random
+    untried tiles on its turn. Appends the seconds from each shot to its
+    result arriving to latencies; returns True if the match was finished."""
+    reader, writer = await asyncio.open_connection(host, port, limit=2**16)
+    layout = next(generate_layouts(default_ships()))
+    writer.write(json.dumps({"type": "join", "layout": encode_layout(layout).decode("utf-8")})
+                 .encode("utf-8") + b"\n")
+    player = None
+    targets = []
+    sent = None
+
+    def fire():
+        nonlocal sent
+        col, row = targets.pop()
+        sent = perf_counter()
+        writer.write(json.dumps({"type": "fire", "col": col, "row": row}).encode("utf-8")
+                     + b"\n")
+
+    finished = False
+    try:
+        while True:
+            line = await reader.readline()
+            if not line:
+                break
+            message = json.loads(line)
+            if message["type"] == "start":
+                player = message["player"]
+                targets = [(col, row) for col in range(message["width"])
+                           for row in range(message["height"])]
+                rng.shuffle(targets)
+                if message["turn"] == player:
+                    fire()
+            elif message["type"] == "shot":
+                if message["player"] == player:
+                    latencies.append(perf_counter() - sent)
+                if message["winner"] is not None:
+                    finished = True
+                    break
+                if message["turn"] == player:
+                    fire()
+            elif message["type"] in ("error", "opponent_left"):
+                break
+            await writer.drain()
+    finally:
+        writer.close()
+    return finished
+
+def raise_open_file_limit():
+    """Thousands of sockets need more than the usual limit of open files."""
+    try:
+        import resource
+        soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    except (ImportError, ValueError, OSError):  # not available (i.e. on Windows)
+        pass
+
+async def load_test(matches, host="127.0.0.1", port=0, connect_rate=500):
+    """Plays many simultaneous simulated matches against an in-process server."""
+    server = MatchServer()
+    listener = await server.start(host, port)
+    port = listener.sockets[0].getsockname()[1]
+    rng = random.Random(0)
+    latencies = []
+
+    started = perf_counter()
+    clients = []
+    for i in range(matches * 2):
+        clients.append(asyncio.ensure_future(simulated_player(host, port, latencies, rng)))
+        if i % connect_rate == connect_rate - 1:
+            await asyncio.sleep(0)  # let connections be accepted in batches
+    results = await asyncio.gather(*clients, return_exceptions=True)
+    elapsed = perf_counter() - started
+    listener.close()
+    await listener.wait_closed()
+
+    finished = sum(result is True for result in results) // 2
+    failed = sum(isinstance(result, BaseException) for result in results)
+    latencies.sort()
+    p50 = latencies[len(latencies) // 2] if latencies else 0.0
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] if latencies else 0.0
+    print(f"{finished} of {matches} matches finished in {elapsed:.2f}s "
+          f"({finished / elapsed:.0f} matches/s, {server.moves / elapsed:.0f} moves/s)")
+    print(f"Move latency: p50 {p50 * 1000:.2f}ms, p99 {p99 * 1000:.2f}ms"
+          + (f"; {failed} clients failed" if failed else ""))
+
+async def serve(host, port):
+    server = MatchServer()
+    listener = await server.start(host, port)
+    print(f"Serving matches on {host}:{port}")
+    async with listener:
+        await listener.serve_forever()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Host two-player matches over TCP.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--load-test", action="store_true",
+                        help="play simulated matches against an in-process server")
+    parser.add_argument("--matches", type=int, default=1000)
+    args = parser.parse_args()
+
+    raise_open_file_limit()
+    if args.load_test:
+        asyncio.run(load_test(args.matches, args.host))
+    else:
+        asyncio.run(serve(args.host, args.port))
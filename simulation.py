@@ -0,0 +1,157 @@
+"""Headless computer-vs-computer matches, used to tune the computer
+players and layouts without a display (no pygame required)."""
+from collections import namedtuple
+from functools import partial
+from multiprocessing import Pool
+from random import seed as seed_random
+from time import perf_counter
+
+from battleships import default_ships, generate_computer_layout, BitBoard
+from computer_player import OpportunityPlayer
+from defaults import board_width, board_height, bonus_turn_on_hit
+
+GameResult = namedtuple("GameResult", "seed winner shots_to_win shots move_times")
+
+class Match:
+    """The turn rules of a two-player game, separate from any display.
+    Players take turns to fire at the other player's board (with a
+    bonus turn on a hit) until every ship on one board is sunk.
+    """
+    def __init__(self, player_ships, width=board_width, height=board_height):
+        self.p_ships = player_ships
+        self.width = width
+        self.height = height
+        # Bitmask boards track your ships and which of your tiles
+        # have been revealed by the other player.
+        self.p_boards = (BitBoard.from_ships(player_ships[0], width, height),
+                         BitBoard.from_ships(player_ships[1], width, height))
+
+        self.turn = 0  # 0 for player 1, 1 for player 2
+        self.winner = None  # None for undecided, 0 for player 1, 1 for player 2
+        self.shots = [0, 0]
+
+    def opponent(self):
+        return int(not self.turn)
+
+    def reveal(self, col, row):
+        """Fire the current player's shot at the opponent's board.
+        Returns the ship that was hit, or None for a miss.
+        """
+        if self.winner is not None:
+            raise ValueError("the match is already over")
+        if not (0 <= col < self.width and 0 <= row < self.height):
+            raise ValueError(f"tile ({col}, {row}) is out of bounds")
+
+        board = self.p_boards[self.opponent()]
+        if board.is_revealed(col, row):
+            raise ValueError(f"tile ({col}, {row}) has already been revealed")
+
+        parent_ship = board.reveal(col, row)
+        self.shots[self.turn] += 1
+
+        if parent_ship is not None and board.destroyed(parent_ship):
+            self.game_win_check()
+        if self.winner is None and (parent_ship is None or not bonus_turn_on_hit):
+            self.turn = self.opponent()
+        return parent_ship
+
+    def game_win_check(self):
+        if self.p_boards[self.opponent()].all_destroyed():
+            self.winner = self.turn
+
+def random_match(width=board_width, height=board_height):
+    """Creates a match between two randomly generated layouts."""
+    p_ships = ([], [])
+    for player in 0, 1:
+        generate_computer_layout(p_ships[player], BitBoard(width, height),
+                                 default_ships(), width, height)
+    return Match(p_ships, width, height)
+
+def play_match(game_seed, width=board_width, height=board_height,
+               player_class=OpportunityPlayer, opponent_class=None):
+    """Plays one whole computer-vs-computer game; the seed fixes both
+    layouts and every random choice made by the players. Player 2 is an
+    opponent_class if given, otherwise another player_class."""
+    seed_random(game_seed)
+    match = random_match(width, height)
+
+    # Each computer player targets the other player's board.
+    players = []
+    for player, cls in enumerate((player_class, opponent_class or player_class)):
+        target = int(not player)
+        board = match.p_boards[target]
+        players.append(cls(match.p_ships[target], board, board, width, height))
+
+    move_times = ([], [])
+    while match.winner is None:
+        start = perf_counter()
+        col, row = players[match.turn].play_move()
+        move_times[match.turn].append(perf_counter() - start)
+
+        if col is None or row is None:
+            break  # the player has given up (no tiles left to reveal)
+        match.reveal(col, row)
+
+    for player in players:
+        if hasattr(player, "close"):
+            player.close()
+
+    shots_to_win = None if match.winner is None else match.shots[match.winner]
+    return GameResult(game_seed, match.winner, shots_to_win, tuple(match.shots),
+                      move_times)
+
+def run_batch(seeds, width=board_width, height=board_height,
+              player_class=OpportunityPlayer, processes=None, chunksize=64):
+    """Plays a game for each seed over a process pool, yielding each
+    GameResult as soon as it finishes (not in seed order)."""
+    play = partial(play_match, width=width, height=height, player_class=player_class)
+
+    if processes == 1:  # useful for profiling: stay in this process
+        for game_seed in seeds:
+            yield play(game_seed)
+        return
+
+    with Pool(processes) as pool:
+        for result in pool.imap_unordered(play, seeds, chunksize):
+            yield result
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="Run headless computer-vs-computer games.")
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=board_width)
+    parser.add_argument("--height", type=int, default=board_height)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--output", help="stream results to this file (JSON lines)")
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output else None
+    started = perf_counter()
+    wins = [0, 0]
+    total_shots = 0
+    slowest_move = 0.0
+
+    game_seeds = range(args.first_seed, args.first_seed + args.games)
+    for game in run_batch(game_seeds, args.width, args.height, processes=args.processes):
+        if game.winner is not None:
+            wins[game.winner] += 1
+            total_shots += game.shots_to_win
+        slowest_move = max([slowest_move, *game.move_times[0], *game.move_times[1]])
+
+        if output is not None:
+            output.write(json.dumps(game._asdict()) + "\n")
+
+    if output is not None:
+        output.close()
+
+    elapsed = perf_counter() - started
+    finished = wins[0] + wins[1]
+    print(f"{args.games} games in {elapsed:.2f}s ({args.games / elapsed * 60:.0f} games/minute)")
+    print(f"Wins: player 1 {wins[0]}, player 2 {wins[1]}")
+    if finished:
+        print(f"Average shots to win: {total_shots / finished:.2f}")
+    print(f"Slowest move: {slowest_move * 1000:.2f}ms")
@@ -1,51 +1,191 @@
 import pygame as pg
+from collections import OrderedDict
 from typing import Union
+import json
+import os
 
-pg.font.init()
-main_font = pg.font.SysFont('Calibri', 16)
+FONT_NAME = 'Calibri'
+# Where the resolved font file path is remembered between runs: delete to rescan.
+FONT_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache"),
+    "battleships", "fonts.json")
 
 COLOR_DEFAULT = (191, 131, 191)
 BACKGROUND_DEFAULT = (15, 15, 15)
 BOX_PADDING = 5
+ATLAS_CHARACTERS = "".join(chr(code) for code in range(32, 127))  # printable ASCII
 
-_sprite_cache = {}
+class SpriteCache:
+    """A bounded cache which evicts the least recently used sprite."""
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self.sprites = OrderedDict()
+        self.hits = 0
+        self.misses = 0
 
-def draw(surface, message: str, position, font=main_font, color=COLOR_DEFAULT,
-         text_sprite=None, static=False, justify: Union[bool, list, tuple] = False):
+    def get(self, key):
+        sprite = self.sprites.get(key)
+        if sprite is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self.sprites.move_to_end(key)
+        return sprite
+
+    def add(self, key, sprite):
+        self.sprites[key] = sprite
+        self.sprites.move_to_end(key)
+        if len(self.sprites) > self.max_size:
+            self.sprites.popitem(last=False)
+
+    def info(self):
+        return {"hits": self.hits, "misses": self.misses,
+                "size": len(self.sprites), "max_size": self.max_size}
+
+class GlyphAtlas:
+    """Every printable ASCII character in one font and colour, rendered
+    once onto a single surface. Text that changes every frame is drawn a
+    character at a time from the atlas, instead of being rendered again.
+    """
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self.extra_glyphs = {}  # characters outside the atlas, rendered on first use
+
+        glyphs = [font.render(char, True, color) for char in ATLAS_CHARACTERS]
+        self.height = max(glyph.get_height() for glyph in glyphs)
+        self.surface = pg.Surface((sum(glyph.get_width() for glyph in glyphs), self.height),
+                                  pg.SRCALPHA)
+
+        self.areas = {}
+        x = 0
+        for char, glyph in zip(ATLAS_CHARACTERS, glyphs):
+            # The atlas starts transparent, so the max blend copies each glyph exactly.
+            self.surface.blit(glyph, (x, 0), special_flags=pg.BLEND_RGBA_MAX)
+            self.areas[char] = pg.Rect(x, 0, glyph.get_width(), glyph.get_height())
+            x += glyph.get_width()
+
+    def glyph(self, char):
+        """Returns the (surface, area) to blit for a character."""
+        area = self.areas.get(char)
+        if area is not None:
+            return self.surface, area
+
+        glyph = self.extra_glyphs.get(char)
+        if glyph is None:
+            glyph = self.font.render(char, True, self.color)
+            self.extra_glyphs[char] = glyph
+        return glyph, glyph.get_rect()
+
+    def size(self, message: str):
+        return sum(self.glyph(char)[1].width for char in message), self.height
+
+    def draw(self, surface, message: str, position):
+        x, y = position
+        for char in message:
+            source, area = self.glyph(char)
+            surface.blit(source, (x, y), area)
+            x += area.width
+        return pg.Rect(position, (x - position[0], self.height))
+
+_sprite_cache = SpriteCache(512)
+_atlas_cache = SpriteCache(32)
+_fonts = {}  # size -> main font at that size
+
+def find_font_path(name):
+    """The file path of a system font (None if it isn't installed).
+    Finding it scans the system font directories, which is slow on a
+    cold start, so the result is cached on disk for later runs.
+    """
+    try:
+        with open(FONT_CACHE_PATH) as file:
+            cache = json.load(file)
+    except (OSError, ValueError):
+        cache = {}
+
+    if name in cache and (cache[name] is None or os.path.exists(cache[name])):
+        return cache[name]
+
+    cache[name] = pg.font.match_font(name)
+    try:
+        os.makedirs(os.path.dirname(FONT_CACHE_PATH), exist_ok=True)
+        with open(FONT_CACHE_PATH, "w") as file:
+            json.dump(cache, file)
+    except OSError:
+        pass  # the cache only saves time; the font is still usable
+    return cache[name]
+
+def get_font(size=16):
+    """The main font at this size, resolved on first use rather than on import."""
+    font = _fonts.get(size)
+    if font is None:
+        if not pg.font.get_init():
+            pg.font.init()
+        font = pg.font.Font(find_font_path(FONT_NAME), size)
+        _fonts[size] = font
+    return font
+
+def draw(surface, message: str, position, font=None, color=COLOR_DEFAULT,
+         text_sprite=None, static=False, justify: Union[bool, list, tuple] = False,
+         dynamic=False):
     """Draws text to the surface at the (x, y) position specified.
     Justify - set to True/False to centre in both axes, or
               pick each of the (x, y) axes to justify with, i.e.
               (True, False) centres horizontally & not vertically.
     Static - cache this text's sprite - for faster drawing.
+    Dynamic - draw from a glyph atlas - for text that changes every frame.
     """
-    if text_sprite is None:
-        text_sprite = render(message, font, color, static)
+    if font is None:
+        font = get_font()
+    if dynamic:
+        atlas = glyph_atlas(font, color)
+        width, height = atlas.size(message)
+    else:
+        if text_sprite is None:
+            text_sprite = render(message, font, color, static)
+        width, height = text_sprite.get_size()
 
     x, y = position
     if justify:
-        text_rect = text_sprite.get_rect()
         if justify is True or justify[0] is True:
-            x -= text_rect.width / 2
+            x -= width / 2
         if justify is True or justify[1] is True:
-            y -= text_rect.height / 2
+            y -= height / 2
 
+    if dynamic:
+        return atlas.draw(surface, message, (x, y))
     return surface.blit(text_sprite, (x, y))
 
-def render(message, font=main_font, color=COLOR_DEFAULT, save_sprite=True):
+def render(message, font=None, color=COLOR_DEFAULT, save_sprite=True):
     """Render text, using the sprite cache if possible.
     Adds to sprite cache when called directly / rendering static text.
     """
+    if font is None:
+        font = get_font()
     text_sprite = _sprite_cache.get((message, font, *color))
 
     if text_sprite is None:
         text_sprite = font.render(message, True, color)
         if save_sprite:
-            _sprite_cache[(message, font, *color)] = text_sprite
+            _sprite_cache.add((message, font, *color), text_sprite)
 
     return text_sprite
 
+def glyph_atlas(font=None, color=COLOR_DEFAULT):
+    if font is None:
+        font = get_font()
+    atlas = _atlas_cache.get((font, *color))
+    if atlas is None:
+        atlas = GlyphAtlas(font, color)
+        _atlas_cache.add((font, *color), atlas)
+    return atlas
+
+def cache_info():
+    """Hit and miss counters and sizes of the text sprite and glyph atlas caches."""
+    return {"sprites": _sprite_cache.info(), "atlases": _atlas_cache.info()}
+
 def box(surface, message: str, position, width=None, height=None, middle=False,
-        box_color=BACKGROUND_DEFAULT, font=main_font, color=COLOR_DEFAULT):
+        box_color=BACKGROUND_DEFAULT, font=None, color=COLOR_DEFAULT):
     """Blits a text box to the surface at position, a pair
     of (x, y) coordinates. Width and height, if omitted, fit
     the text's size (with padding). Middle centres text.
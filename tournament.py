@@ -0,0 +1,188 @@
+"""Round-robin tournaments between the computer players in
+computer_player.PLAYERS (or any module:Class path). Every pair plays each
+seeded layout twice, taking turns to move first. Games are handed out one
+at a time to a process pool, so idle workers take the next game, and the
+standings (wins and Elo ratings) are updated as results arrive.
+
+Progress is saved to a JSON checkpoint; rerun the same command to resume.
+
+    python tournament.py --players opportunity sparse exact --games 1000
+"""
+from functools import partial
+from itertools import combinations
+from multiprocessing import Pool
+from time import perf_counter
+import json
+import os
+import signal
+
+from benchmark_ai import load_player
+from computer_player import PLAYERS
+from defaults import board_width, board_height
+from simulation import play_match
+
+INITIAL_RATING = 1500.0
+K_FACTOR = 16
+
+def resolve_player(name):
+    """A registered player's class, or the class at a module:Class path."""
+    if name in PLAYERS:
+        return PLAYERS[name]
+    return load_player(name)
+
+def player_path(name):
+    """The module:Class path of a player, which pool workers can import even
+    if the player was registered at runtime (workers started by spawning a
+    new interpreter, as on Windows and macOS, don't share the registry)."""
+    player_class = resolve_player(name)
+    return f"{player_class.__module__}:{player_class.__qualname__}"
+
+def schedule(players, games, first_seed=0):
+    """Every (game number, seed, first player, second player) of the tournament."""
+    jobs = []
+    for player, opponent in combinations(players, 2):
+        for game_seed in range(first_seed, first_seed + games):
+            for first, second in (player, opponent), (opponent, player):
+                jobs.append((len(jobs), game_seed, first, second))
+    return jobs
+
+def play_job(job, paths, width=board_width, height=board_height):
+    """Plays one scheduled game: returns (game number, first, second, winner),
+    where winner is 0 or 1 for the first or second player, or None.
+    paths maps the players' names to their module:Class paths."""
+    number, game_seed, first, second = job
+    result = play_match(game_seed, width, height, load_player(paths[first]),
+                        load_player(paths[second]))
+    return number, first, second, result.winner
+
+def ignore_interrupts():
+    """Pool initializer: only the main process handles Ctrl+C (and saves the checkpoint)."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+class Standings:
+    """Wins, losses and Elo ratings of each player."""
+    def __init__(self, players):
+        self.ratings = {player: INITIAL_RATING for player in players}
+        self.wins = {player: 0 for player in players}
+        self.losses = {player: 0 for player in players}
+        self.unfinished = {player: 0 for player in players}
+
+    def record(self, first, second, winner):
+        if winner is None:  # a player gave up
+            self.unfinished[first] += 1
+            self.unfinished[second] += 1
+            score = 0.5
+        else:
+            winning, losing = (first, second) if winner == 0 else (second, first)
+            self.wins[winning] += 1
+            self.losses[losing] += 1
+            score = 1.0 if winner == 0 else 0.0
+
+        expected = 1 / (1 + 10 ** ((self.ratings[second] - self.ratings[first]) / 400))
+        self.ratings[first] += K_FACTOR * (score - expected)
+        self.ratings[second] -= K_FACTOR * (score - expected)
+
+    def table(self):
+        """Lines of the standings, best rated first."""
+        lines = [f"{'player':<24} {'elo':>7} {'games':>7} {'win rate':>9}"]
+        for player in sorted(self.ratings, key=self.ratings.get, reverse=True):
+            games = self.wins[player] + self.losses[player] + self.unfinished[player]
+            win_rate = self.wins[player] / games if games else 0.0
+            lines.append(f"{player:<24} {self.ratings[player]:>7.1f} {games:>7} "
+                         f"{win_rate:>9.1%}")
+        return lines
+
+    def to_dict(self):
+        return {"ratings": self.ratings, "wins": self.wins, "losses": self.losses,
+                "unfinished": self.unfinished}
+
+    @classmethod
+    def from_dict(cls, data):
+        standings = cls(data["ratings"])
+        standings.ratings.update(data["ratings"])
+        standings.wins.update(data["wins"])
+        standings.losses.update(data["losses"])
+        standings.unfinished.update(data["unfinished"])
+        return standings
+
+def load_checkpoint(path, config):
+    """(finished game numbers, standings) from a checkpoint of the same
+    tournament, or None if there is no checkpoint."""
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path) as file:
+        checkpoint = json.load(file)
+    if checkpoint["config"] != config:
+        raise ValueError(f"{path} is a checkpoint of a different tournament: "
+                         f"{checkpoint['config']}")
+    return set(checkpoint["done"]), Standings.from_dict(checkpoint["standings"])
+
+def save_checkpoint(path, config, done, standings):
+    """Writes the checkpoint to a temporary file first, so an interruption
+    while saving leaves the previous checkpoint intact."""
+    temporary_path = path + ".tmp"
+    with open(temporary_path, "w") as file:
+        json.dump({"config": config, "done": sorted(done),
+                   "standings": standings.to_dict()}, file)
+    os.replace(temporary_path, path)
+
+def run_tournament(players, games, first_seed=0, width=board_width, height=board_height,
+                   processes=None, checkpoint=None, checkpoint_interval=10.0):
+    """Plays (or resumes) a tournament; returns the standings."""
+    paths = {player: player_path(player) for player in players}  # fails early if unknown
+    config = {"players": list(players), "games": games, "first_seed": first_seed,
+              "width": width, "height": height}
+
+    jobs = schedule(players, games, first_seed)
+    resumed = load_checkpoint(checkpoint, config)
+    done, standings = resumed if resumed is not None else (set(), Standings(players))
+    pending = [job for job in jobs if job[0] not in done]
+    print(f"{len(jobs)} games, {len(done)} already played")
+
+    play = partial(play_job, paths=paths, width=width, height=height)
+    started = last_saved = perf_counter()
+    played = 0
+    try:
+        with Pool(processes, ignore_interrupts) as pool:
+            for number, first, second, winner in pool.imap_unordered(play, pending, chunksize=1):
+                standings.record(first, second, winner)
+                done.add(number)
+                played += 1
+
+                if checkpoint is not None and perf_counter() - last_saved > checkpoint_interval:
+                    save_checkpoint(checkpoint, config, done, standings)
+                    last_saved = perf_counter()
+                    elapsed = last_saved - started
+                    print(f"{len(done)} of {len(jobs)} games "
+                          f"({played / elapsed:.0f} games/s)")
+    finally:  # also on KeyboardInterrupt, to resume later
+        if checkpoint is not None:
+            save_checkpoint(checkpoint, config, done, standings)
+    return standings
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Round-robin tournament of computer players.")
+    parser.add_argument("--players", nargs="+", default=list(PLAYERS),
+                        help=f"registered players ({', '.join(PLAYERS)}) or module:Class "
+                             "paths (default: every registered player)")
+    parser.add_argument("--games", type=int, default=1000,
+                        help="seeded layouts per pair (each is played twice)")
+    parser.add_argument("--first-seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=board_width)
+    parser.add_argument("--height", type=int, default=board_height)
+    parser.add_argument("--processes", type=int, default=None)
+    parser.add_argument("--checkpoint", default="tournament.json",
+                        help="resume from and save progress to this file")
+    args = parser.parse_args()
+
+    try:
+        final_standings = run_tournament(args.players, args.games, args.first_seed,
+                                         args.width, args.height, args.processes,
+                                         args.checkpoint)
+    except KeyboardInterrupt:
+        print(f"Interrupted: progress is saved in {args.checkpoint}, rerun to resume.")
+    else:
+        print("\n".join(final_standings.table()))